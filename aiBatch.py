@@ -0,0 +1,143 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import time
+from datetime import datetime
+from runtime import DATA_DIR, get_openai_client
+
+# 🔹 Offline batch inference
+# The nightly analysis doesn't need interactive latency: every prompt is written to one JSONL job
+# file (OpenAI Batch API request format), submitted as a single job, polled until it completes and
+# the responses are returned by request id. Backends are pluggable; the local one answers from a
+# results file on disk so the whole flow can run without network access.
+
+AI_BATCH_DIR = os.getenv("AI_BATCH_DIR", os.path.join(DATA_DIR, "ai_batches"))
+AI_BATCH_BACKEND = os.getenv("AI_BATCH_BACKEND", "openai")  # "openai" or "local"
+AI_BATCH_POLL_SECONDS = int(os.getenv("AI_BATCH_POLL_SECONDS", "60"))
+AI_BATCH_TIMEOUT_HOURS = float(os.getenv("AI_BATCH_TIMEOUT_HOURS", "24"))
+CHAT_ENDPOINT = "/v1/chat/completions"
+
+
+def build_request(custom_id, messages, model="gpt-4o"):
+    """One line of the job file."""
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_ENDPOINT, "body": {"model": model, "messages": messages}}
+
+
+def write_job_file(requests, directory=AI_BATCH_DIR):
+    """Write the requests as JSONL and return the file path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
+    return path
+
+
+def parse_output_lines(lines):
+    """Batch output JSONL -> {custom_id: message content} (failed requests are left out)."""
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code", 200) != 200:
+            print(f"⚠️ Batch request {record.get('custom_id')} failed: {record.get('error') or response.get('status_code')}")
+            continue
+        results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: upload the job file, create a 24h batch, download the output file."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, job_path):
+        with open(job_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=CHAT_ENDPOINT, completion_window="24h")
+        return batch.id
+
+    def status(self, job_id):
+        return self.client.batches.retrieve(job_id).status
+
+    def results(self, job_id):
+        batch = self.client.batches.retrieve(job_id)
+        if not batch.output_file_id:
+            return {}
+        return parse_output_lines(self.client.files.content(batch.output_file_id).text.splitlines())
+
+
+class LocalFileBackend:
+    """Offline stand-in: the job completes once `<job>.output.jsonl` exists next to the job file.
+
+    With a `responder(request_body) -> content` the output file is written at submit time
+    (tests / dry runs); without one, the output file can be produced by any other tool.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder
+
+    @staticmethod
+    def _output_path(job_id):
+        return job_id[:-len(".jsonl")] + ".output.jsonl"
+
+    def submit(self, job_path):
+        if self.responder is not None:
+            with open(job_path, encoding="utf-8") as f, open(self._output_path(job_path), "w", encoding="utf-8") as out:
+                for line in f:
+                    request = json.loads(line)
+                    content = self.responder(request["body"])
+                    out.write(json.dumps({
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}},
+                        "error": None,
+                    }) + "\n")
+        return job_path
+
+    def status(self, job_id):
+        return "completed" if os.path.exists(self._output_path(job_id)) else "in_progress"
+
+    def results(self, job_id):
+        with open(self._output_path(job_id), encoding="utf-8") as f:
+            return parse_output_lines(f)
+
+
+def get_backend(name=AI_BATCH_BACKEND, client=None, responder=None):
+    """Build the backend; the OpenAI client is only created when the OpenAI backend is chosen."""
+    if name == "openai":
+        return OpenAIBatchBackend(client or get_openai_client())
+    if name == "local":
+        if responder is None:
+            print(f"⚠️ Local batch backend without a responder: waiting for '<job>.output.jsonl' in {AI_BATCH_DIR}")
+        return LocalFileBackend(responder)
+    raise ValueError(f"Unknown AI batch backend '{name}' (use 'openai' or 'local')")
+
+
+# 🔹 Function to run one batch job end to end
+def run_batch(requests, backend, poll_seconds=AI_BATCH_POLL_SECONDS, timeout_hours=AI_BATCH_TIMEOUT_HOURS):
+    """Submit every request as one job, wait for it, and return {custom_id: content}."""
+    if not requests:
+        return {}
+    job_path = write_job_file(requests)
+    job_id = backend.submit(job_path)
+    print(f"📦 Submitted batch job {job_id} ({len(requests)} requests, file {job_path})")
+
+    deadline = time.monotonic() + timeout_hours * 3600
+    while True:
+        status = backend.status(job_id)
+        if status == "completed":
+            break
+        if status in ("failed", "expired", "cancelled"):
+            print(f"❌ Batch job {job_id} ended with status '{status}'")
+            return {}
+        if time.monotonic() >= deadline:
+            print(f"❌ Batch job {job_id} still '{status}' after {timeout_hours}h, giving up")
+            return {}
+        print(f"⏳ Batch job {job_id} is '{status}', checking again in {poll_seconds}s...")
+        time.sleep(poll_seconds)
+
+    results = backend.results(job_id)
+    print(f"✅ Batch job {job_id} completed: {len(results)}/{len(requests)} responses")
+    return results
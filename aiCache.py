@@ -0,0 +1,168 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from runtime import DATA_DIR, clean_float
+
+# 🔹 Local AI analysis cache
+# AI_Cache used to be searched by re-downloading the whole worksheet on every save. Analyses now
+# live in SQLite only; the sheet is no longer read or written (its rows can't be reused, see below).
+#
+# Reuse is decided by a content-addressed key over the inputs the analysis actually turns on: the
+# price band (relative tolerance), RSI band, side of the VWMA, monthly trend in wide buckets,
+# industry and the set of headlines. Day-to-day noise (volume, market cap, yesterday's close, the
+# 1-day/1-week changes, every moving average on its own) is left out, so a ticker whose picture hasn't
+# changed is served from the cache on the next day's run too, not just on same-day reruns.
+
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(DATA_DIR, "ai_cache.sqlite"))
+
+# 🔹 Cache key quantization and eviction (override from the workflow environment)
+AI_CACHE_PRICE_TOLERANCE = float(os.getenv("AI_CACHE_PRICE_TOLERANCE", "0.05"))  # Relative bucket size
+AI_CACHE_RSI_BUCKET = float(os.getenv("AI_CACHE_RSI_BUCKET", "10"))
+AI_CACHE_CHANGE_BUCKET = float(os.getenv("AI_CACHE_CHANGE_BUCKET", "10"))  # Percentage points
+AI_CACHE_MAX_AGE_DAYS = float(os.getenv("AI_CACHE_MAX_AGE_DAYS", "7"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+AI_CACHE_EVICTION = os.getenv("AI_CACHE_EVICTION", "lru")  # "lru" (least recently used) or "fifo" (oldest first)
+# The analysis text names the ticker, so keys include Symbol/Name unless explicitly shared
+AI_CACHE_SHARE_ACROSS_TICKERS = os.getenv("AI_CACHE_SHARE_ACROSS_TICKERS", "0") == "1"
+
+# 🔹 Key inputs and how each is quantized
+IDENTITY_FIELDS = ["Symbol", "Name"]
+PRICE_FIELDS = ["Current Price"]
+CHANGE_FIELDS = ["1 Month Price Change"]
+EXACT_FIELDS = ["Industry"]
+HEADLINE_FIELDS = ["News 1", "News 2", "News 3", "News 4", "News 5"]
+
+_connection = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_connection():
+    """Open (once) the AI cache and make sure the schema exists."""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(AI_CACHE_PATH) or ".", exist_ok=True)
+        _connection = sqlite3.connect(AI_CACHE_PATH, check_same_thread=False)
+        _connection.execute(
+            """CREATE TABLE IF NOT EXISTS ai_results (
+                key TEXT PRIMARY KEY,
+                ticker TEXT,
+                ai_analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        _connection.execute("CREATE TABLE IF NOT EXISTS ai_cache_stats (run_at REAL, hits INTEGER, misses INTEGER)")
+        _connection.commit()
+    return _connection
+
+
+def _number(value):
+    """Sheet text ("12.5%", "$1,234", "N/A") -> float or None."""
+    return clean_float(value, default=None)
+
+
+def _relative_bucket(value, tolerance):
+    """(sign, bucket index on a log scale), so values within ~`tolerance` of each other share a bucket."""
+    if value is None or not math.isfinite(value):
+        return None
+    if value == 0:
+        return 0
+    return (int(math.copysign(1, value)), math.floor(math.log(abs(value)) / math.log1p(tolerance)))
+
+
+def _width_bucket(value, width):
+    if value is None or not math.isfinite(value):
+        return None
+    return math.floor(value / width)
+
+
+def cache_key(row_dict):
+    """Hash of the quantized key inputs of one Top Picks row."""
+    vwma_gap = _number(row_dict.get("VWMA vs Current Price", "N/A"))
+    headlines = sorted({
+        " ".join(str(row_dict.get(field, "")).lower().split())
+        for field in HEADLINE_FIELDS if row_dict.get(field, "N/A") not in ("", "N/A")
+    })
+    inputs = {
+        "price": {field: _relative_bucket(_number(row_dict.get(field, "N/A")), AI_CACHE_PRICE_TOLERANCE) for field in PRICE_FIELDS},
+        "change": {field: _width_bucket(_number(row_dict.get(field, "N/A")), AI_CACHE_CHANGE_BUCKET) for field in CHANGE_FIELDS},
+        "rsi": _width_bucket(_number(row_dict.get("RSI", "N/A")), AI_CACHE_RSI_BUCKET),
+        "above_vwma": None if vwma_gap is None else vwma_gap > 0,
+        "exact": {field: str(row_dict.get(field, "N/A")).strip() for field in EXACT_FIELDS},
+        "headlines": hashlib.sha256("\n".join(headlines).encode()).hexdigest(),
+    }
+    if not AI_CACHE_SHARE_ACROSS_TICKERS:
+        inputs["identity"] = {field: str(row_dict.get(field, "N/A")).strip() for field in IDENTITY_FIELDS}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def evict_ai_results():
+    """Drop results older than AI_CACHE_MAX_AGE_DAYS, then trim to AI_CACHE_MAX_ENTRIES."""
+    order_by = "created_at" if AI_CACHE_EVICTION == "fifo" else "last_used_at"
+    conn = get_connection()
+    with _lock:
+        expired = conn.execute("DELETE FROM ai_results WHERE created_at < ?",
+                               (time.time() - AI_CACHE_MAX_AGE_DAYS * 86400,)).rowcount
+        trimmed = conn.execute(
+            f"DELETE FROM ai_results WHERE key NOT IN (SELECT key FROM ai_results ORDER BY {order_by} DESC LIMIT ?)",
+            (AI_CACHE_MAX_ENTRIES,),
+        ).rowcount
+        conn.commit()
+    if expired or trimmed:
+        print(f"🧹 AI cache eviction: {expired} expired, {trimmed} over the {AI_CACHE_MAX_ENTRIES}-entry limit ({AI_CACHE_EVICTION})")
+
+
+def lookup_analysis(key):
+    """Return the cached analysis for a key (or None) and count the hit/miss."""
+    conn = get_connection()
+    with _lock:
+        row = conn.execute("SELECT ai_analysis FROM ai_results WHERE key = ? AND created_at >= ?",
+                           (key, time.time() - AI_CACHE_MAX_AGE_DAYS * 86400)).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        conn.execute("UPDATE ai_results SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        conn.commit()
+        _stats["hits"] += 1
+    return row[0]
+
+
+def store_analysis(key, ticker, ai_analysis):
+    now = time.time()
+    conn = get_connection()
+    with _lock:
+        conn.execute("INSERT OR REPLACE INTO ai_results VALUES (?, ?, ?, ?, ?, 0)", (key, ticker, ai_analysis, now, now))
+        conn.commit()
+
+
+def cache_stats():
+    """This run's hits/misses plus the hit rate over every recorded run."""
+    conn = get_connection()
+    with _lock:
+        total_hits, total_misses = conn.execute("SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) FROM ai_cache_stats").fetchone()
+    lookups = _stats["hits"] + _stats["misses"]
+    total_hits, total_lookups = total_hits + _stats["hits"], total_hits + total_misses + lookups
+    return {
+        **_stats,
+        "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+        "lifetime_hit_rate": total_hits / total_lookups if total_lookups else 0.0,
+    }
+
+
+def record_cache_stats():
+    """Print this run's hit rate and add it to the stats history."""
+    stats = cache_stats()
+    print(f"📊 AI cache: {stats['hits']} hits / {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} this run, {stats['lifetime_hit_rate']:.0%} overall)")
+    conn = get_connection()
+    with _lock:
+        conn.execute("INSERT INTO ai_cache_stats VALUES (?, ?, ?)", (time.time(), _stats["hits"], _stats["misses"]))
+        conn.commit()
+        _stats.update(hits=0, misses=0)  # ✅ Recorded, so it is not counted twice
+    return stats
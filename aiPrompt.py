@@ -0,0 +1,104 @@
+import math
+
+try:
+    import tiktoken  # Optional: exact token counts
+except ImportError:
+    tiktoken = None
+
+# 🔹 AI prompt builder
+# Everything static (role, task, response structure) goes first in the system message and the
+# per-ticker data comes last as a compact key=value block, leaving out fields that are missing.
+# The static prefix is ~370 tokens, below OpenAI's 1,024-token prompt-caching minimum, so no request
+# gets a cached-prefix discount; the savings come from the shorter prompt itself.
+
+SYSTEM_PROMPT = """You are a highly successful stock analyst and portfolio manager, specializing in high-growth, low-risk investments with strong profit potential. You provide precise buy/sell recommendations.
+
+Task: analyze the stock described in the user message (key=value lines: market data, technical indicators, sentiment ratings and News headlines). Price changes are percentages. Fields that are not listed are unavailable; use the most recent information you know for them.
+
+Follow this exact response structure:
+
+### 1️⃣ Recommendation: **[Buy/Hold/Sell]**
+- Decision must be clear: **BUY**, **HOLD**, or **SELL**.
+- Justify it with technical indicators, sentiment, valuation and market conditions, and explain whether the stock has high growth potential or risks.
+---
+
+### 2️⃣ Recommended Buy Price
+- **Buy Range:** **$[Predicted Min Buy Price] - $[Predicted Max Buy Price]**
+- The buy price must be below the current price; if the current price is already below the range, adjust the calculation.
+---
+
+### 3️⃣ Recommended Sell Price
+- **Sell Range:** **$[Predicted Min Sell Price] - $[Predicted Max Sell Price]**
+- Use historical highs, resistance levels and market trends to set exit targets.
+
+### **4️⃣ Technical Analysis Summary**
+- The indicators with the most impact on the stock, any breakouts, trend reversals or risk factors, and whether this is a strong technical setup for a trade.
+
+Your goal is to maximize profitability with an accurate, data-driven analysis."""
+
+# (sheet column, key used in the data block) in prompt order
+DATA_FIELDS = [
+    ("Symbol", "symbol"),
+    ("Name", "name"),
+    ("Industry", "industry"),
+    ("Current Price", "price"),
+    ("Yesterday Close Price", "prev_close"),
+    ("Market Cap", "market_cap"),
+    ("P/E", "pe"),
+    ("1 Day Price Change", "chg_1d"),
+    ("1 Week Price Change", "chg_1w"),
+    ("1 Month Price Change", "chg_1m"),
+    ("Volume", "volume"),
+    ("RSI", "rsi"),
+    ("VWMA", "vwma"),
+    ("EMA", "ema"),
+    ("ATR", "atr"),
+    ("VWMA vs Current Price", "vwma_vs_price"),
+    ("Positive Rating", "positive_rating"),
+    ("Negative Rating", "negative_rating"),
+]
+NEWS_FIELDS = ["News 1", "News 2", "News 3", "News 4", "News 5"]
+MISSING_VALUES = {"", "N/A", "NA", "NAN", "NONE", "INF", "-INF"}
+
+MODEL = "gpt-4o"
+TOKENS_PER_MESSAGE = 4  # Chat format overhead per message
+
+
+def _present(value):
+    return str(value).strip().upper() not in MISSING_VALUES
+
+
+def build_data_block(row_dict):
+    """Compact key=value lines for one stock, without missing fields."""
+    lines = [f"{key}={str(row_dict[column]).strip()}" for column, key in DATA_FIELDS
+             if column in row_dict and _present(row_dict[column])]
+    lines += [f"news={' '.join(str(row_dict[column]).split())}" for column in NEWS_FIELDS
+              if column in row_dict and _present(row_dict[column])]
+    return "\n".join(lines)
+
+
+def build_messages(row_dict):
+    """Static system prefix first, per-ticker data last."""
+    return [{"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_data_block(row_dict)}]
+
+
+def _encoder(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_text_tokens(text, model=MODEL):
+    """tiktoken count when installed, otherwise ~4 characters per token."""
+    if tiktoken is not None:
+        return len(_encoder(model).encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def count_tokens(messages, model=MODEL):
+    """Return {"prefix": static system tokens, "data": per-ticker tokens, "total": prompt tokens}."""
+    counts = [count_text_tokens(message["content"], model) + TOKENS_PER_MESSAGE for message in messages]
+    prefix = sum(count for message, count in zip(messages, counts) if message["role"] == "system")
+    return {"prefix": prefix, "data": sum(counts) - prefix, "total": sum(counts) + 3, "exact": tiktoken is not None}
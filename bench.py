@@ -0,0 +1,360 @@
+import os  # Required for environment variables
+import sys
+import json  # Required for JSON parsing
+import time
+import pickle
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import importlib
+import subprocess
+import tracemalloc
+from collections import deque
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# 🔹 Offline record/replay benchmark for the pipeline stages
+# `record` runs each stage once against the live services (and the real spreadsheet) and saves
+# every yfinance, Sheets and OpenAI response, together with a copy of the local data directory
+# the stage started from. `replay` runs each stage in a fresh process from that copy with the
+# saved responses and reports wall time, CPU time, peak memory and API calls per stage.
+#
+#   python bench.py record                       # every stage, fixtures in data/bench_fixtures
+#   python bench.py replay --json bench.json     # offline; save the report
+#   python bench.py replay --baseline bench.json # exit 1 when a stage got slower or chattier
+#
+# Responses are matched on the call and its arguments; calls whose arguments depend on the clock
+# (write payloads, download windows) fall back to the recorded responses of the same method in order.
+
+STAGES = ["fetchData", "updateEarnings", "scoreUpdate", "updateHybrid", "updateTop", "AiAnalysis"]
+DATA_SOURCE_DIR = os.getenv("STOCK_DATA_DIR", "data")
+BENCH_FIXTURES_DIR = os.getenv("BENCH_FIXTURES_DIR", os.path.join(DATA_SOURCE_DIR, "bench_fixtures"))
+RESULT_PREFIX = "BENCH_RESULT "
+
+# 🔹 Replays measure our own code, so client-side pacing is lifted unless --paced is given
+UNPACED_ENV = {
+    "YF_REQUESTS_PER_SECOND": "1000000",
+    "YF_BURST": "1000000",
+    "OPENAI_REQUESTS_PER_MINUTE": "1000000000",
+    "OPENAI_TOKENS_PER_MINUTE": "1000000000",
+}
+
+DATA_TYPES = (dict, list, tuple, str, bytes, int, float, bool, type(None))
+
+
+def _is_data(value):
+    """Responses that are saved as they are (anything else is a handle whose calls are recorded)."""
+    return isinstance(value, DATA_TYPES) or type(value).__module__.startswith("pandas") or hasattr(value, "model_dump")
+
+
+def _is_error_class(value):
+    return isinstance(value, type) and issubclass(value, BaseException)
+
+
+def _args_key(args, kwargs):
+    return hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()[:12]
+
+
+class CallLog:
+    """Recorded responses: exact (call + arguments) and loose (call only) queues, in call order.
+
+    Both queues hold the same slots, so a response served through one index is never served
+    again through the other; once a key's responses are used up its last one repeats.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries or []  # [(api, exact key, loose key, outcome, value)]
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.loose_matches = 0
+        self.exact, self.loose = {}, {}
+        self.last = {}  # {exact or loose key: last slot served}
+        for _, exact, loose, outcome, value in self.entries:
+            slot = {"response": (outcome, value), "used": False}
+            self.exact.setdefault(exact, deque()).append(slot)
+            self.loose.setdefault(loose, deque()).append(slot)
+
+    def count(self, api):
+        if api:  # Sheets handles pass None: their requests are counted once, by the gateway
+            self.counts[api] = self.counts.get(api, 0) + 1
+
+    def add(self, api, exact, loose, outcome, value):
+        with self.lock:
+            self.entries.append((api, exact, loose, outcome, value))
+            self.count(api)
+
+    @staticmethod
+    def _next(queue):
+        while queue and queue[0]["used"]:
+            queue.popleft()
+        return queue[0] if queue else None
+
+    def take(self, api, exact, loose):
+        """Next recorded response for the call, or None when it was never recorded (a handle)."""
+        with self.lock:
+            slot, fallback = self._next(self.exact.get(exact)), False
+            if slot is None:
+                slot, fallback = self._next(self.loose.get(loose)), loose != exact
+            if slot is not None:
+                slot["used"] = True
+                self.last[exact] = self.last[loose] = slot
+            else:  # ✅ Used up: the last response repeats
+                slot = self.last.get(exact) or self.last.get(loose)
+                fallback = exact not in self.last and loose != exact
+            if slot is None:
+                return None
+            self.count(api)
+            self.loose_matches += fallback
+            return slot["response"]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self.entries, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(pickle.load(f))
+
+
+class Recorder:
+    """Wraps a live object; data returned by its attributes and calls is appended to the log."""
+
+    def __init__(self, target, path, api, log):
+        self._target, self._path, self._api, self._log = target, path, api, log
+
+    def _capture(self, exact, loose, produce):
+        try:
+            value = produce()
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+                saved = e
+            except Exception:
+                saved = RuntimeError(f"{type(e).__name__}: {e}")
+            self._log.add(self._api, exact, loose, "raise", saved)
+            raise
+        if _is_error_class(value) or not _is_data(value):
+            return value if _is_error_class(value) else Recorder(value, exact, self._api, self._log)
+        self._log.add(self._api, exact, loose, "return", value)
+        return value
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if attr.startswith("_") or _is_error_class(value):  # Module internals and exception classes pass through
+            return value
+        path = f"{self._path}.{attr}"
+        if callable(value) and not _is_data(value):
+            return Recorder(value, path, self._api, self._log)
+        return self._capture(path, path, lambda: value)
+
+    def __call__(self, *args, **kwargs):
+        exact = f"{self._path}({_args_key(args, kwargs)})"
+        return self._capture(exact, f"{self._path}()", lambda: self._target(*args, **kwargs))
+
+
+class Replayer:
+    """Stands in for a recorded object and answers from the log."""
+
+    _errors = {}
+
+    def __init__(self, path, api, log):
+        self._path, self._api, self._log = path, api, log
+
+    def _answer(self, exact, loose):
+        recorded = self._log.take(self._api, exact, loose)
+        if recorded is None:
+            return Replayer(exact, self._api, self._log)
+        outcome, value = recorded
+        if outcome == "raise":
+            raise value
+        return value
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        if attr.endswith("Error"):  # ✅ Exception classes named in `except` clauses
+            return Replayer._errors.setdefault(attr, type(attr, (Exception,), {}))
+        path = f"{self._path}.{attr}"
+        return self._answer(path, path)
+
+    def __call__(self, *args, **kwargs):
+        return self._answer(f"{self._path}({_args_key(args, kwargs)})", f"{self._path}()")
+
+
+class BenchGateway:
+    """Sheets gateway used by the stages during a benchmark run."""
+
+    def __init__(self, mode, log):
+        self.mode = mode
+        self.log = log
+        self.live = None
+        if mode == "record":
+            from sheetsGateway import SheetsGateway, load_credentials_from_env
+            self.live = SheetsGateway(load_credentials_from_env())
+
+    def run(self, kind, fn, sheet_name=None, max_retries=5):
+        path = f"sheets[{sheet_name}]"
+        with self.log.lock:
+            self.log.count(f"sheets_{kind}")
+        if self.mode == "record":
+            return self.live.run(kind, lambda handle: fn(Recorder(handle, path, None, self.log)), sheet_name, max_retries)
+        return fn(Replayer(path, None, self.log))
+
+    def read(self, sheet_name, fn):
+        return self.run("read", fn, sheet_name)
+
+    def write(self, sheet_name, fn):
+        return self.run("write", fn, sheet_name)
+
+
+def _max_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# 🔹 One stage in this process (run by the parent through a subprocess)
+def run_child(mode, stage, stage_dir, memory):
+    memory = memory or resource is None  # ✅ No getrusage (Windows): measure with tracemalloc instead
+    calls_path = os.path.join(stage_dir, "calls.pkl")
+    log = CallLog.load(calls_path) if mode == "replay" else CallLog()
+
+    import sheetsGateway
+    sheetsGateway._gateway = BenchGateway(mode, log)
+    for module_name, api in (("yfinance", "yfinance"), ("openai", "openai")):
+        if mode == "record":
+            sys.modules[module_name] = Recorder(importlib.import_module(module_name), module_name, api, log)
+        else:
+            sys.modules[module_name] = Replayer(module_name, api, log)
+
+    if memory:
+        tracemalloc.start()
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        importlib.import_module(stage).run()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    result = {
+        "stage": stage,
+        "wall_s": round(time.perf_counter() - wall_started, 3),
+        "cpu_s": round(time.process_time() - cpu_started, 3),
+        "peak_mb": round((tracemalloc.get_traced_memory()[1] if memory else _max_rss_bytes()) / 2 ** 20, 1),
+        "peak_kind": "tracemalloc" if memory else "maxrss",
+        "calls": dict(sorted(log.counts.items())),
+        "loose_matches": log.loose_matches,
+        "error": error,
+    }
+    if mode == "record" and error is None:
+        log.save(calls_path)
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def _run_stage(mode, stage, fixtures_dir, args):
+    """Run one stage in a fresh process from the stage's saved data directory; return its result."""
+    stage_dir = os.path.abspath(os.path.join(fixtures_dir, stage))  # ✅ The child runs from the repo directory
+    start_data = os.path.join(stage_dir, "data_before")
+    if mode == "record":
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        if os.path.isdir(DATA_SOURCE_DIR) and not args.cold:
+            shutil.copytree(DATA_SOURCE_DIR, start_data,
+                            ignore=shutil.ignore_patterns(os.path.basename(os.path.normpath(fixtures_dir))))
+        else:
+            os.makedirs(start_data)
+    elif not os.path.exists(os.path.join(stage_dir, "calls.pkl")):
+        return {"stage": stage, "error": f"no fixtures in {stage_dir} (run `python bench.py record` first)"}
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{stage}_") as work_dir:
+        data_dir = os.path.join(work_dir, "data")
+        shutil.copytree(start_data, data_dir)
+        env = dict(os.environ, STOCK_DATA_DIR=data_dir, BENCH_FIXTURES_DIR=fixtures_dir)
+        if mode == "replay" and not args.paced:
+            env.update(UNPACED_ENV)
+        command = [sys.executable, os.path.abspath(__file__), "_child", mode, stage, stage_dir] + (["--memory"] if args.memory else [])
+        completed = subprocess.run(command, env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    with open(os.path.join(stage_dir, f"{mode}.log"), "w", encoding="utf-8") as f:
+        f.write(completed.stdout + completed.stderr)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {"stage": stage, "error": f"stage process exited with {completed.returncode} (see {stage_dir}/{mode}.log)"}
+
+
+def print_report(results):
+    print(f"\n{'Stage':<16}{'Wall s':>9}{'CPU s':>9}{'Peak MB':>9}  API calls")
+    for result in results:
+        if result.get("wall_s") is None:
+            print(f"{result['stage']:<16}❌ {result['error']}")
+            continue
+        calls = ", ".join(f"{api}={count}" for api, count in result["calls"].items()) or "none"
+        note = f"  ❌ {result['error']}" if result["error"] else ""
+        note += f"  ⚠️ {result['loose_matches']} loosely matched" if result.get("loose_matches") else ""
+        print(f"{result['stage']:<16}{result['wall_s']:>9.2f}{result['cpu_s']:>9.2f}{result['peak_mb']:>9.1f}  {calls}{note}")
+
+
+def find_regressions(results, baseline, threshold):
+    """Stages that got slower than `threshold` (relative, ignoring < 50ms) or make more API calls."""
+    previous = {result["stage"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["stage"])
+        if before is None or result.get("wall_s") is None or before.get("wall_s") is None:
+            continue
+        for metric in ("wall_s", "cpu_s"):
+            if result[metric] - before[metric] > max(threshold * before[metric], 0.05):
+                regressions.append(f"{result['stage']}: {metric} {before[metric]} -> {result[metric]}")
+        for api, count in result["calls"].items():
+            if count > before["calls"].get(api, 0):
+                regressions.append(f"{result['stage']}: {api} calls {before['calls'].get(api, 0)} -> {count}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_child":
+        mode, stage, stage_dir = sys.argv[2:5]
+        return run_child(mode, stage, stage_dir, "--memory" in sys.argv[5:])
+
+    parser = argparse.ArgumentParser(description="Record/replay benchmark for the pipeline stages")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("stages", nargs="*", help=f"subset of {STAGES}")
+    parser.add_argument("--fixtures", default=BENCH_FIXTURES_DIR)
+    parser.add_argument("--cold", action="store_true", help="record from an empty data directory")
+    parser.add_argument("--paced", action="store_true", help="keep the client-side rate limits on replay")
+    parser.add_argument("--memory", action="store_true", help="peak Python allocations via tracemalloc (slower)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        sys.exit(f"❌ Unknown stage(s) {unknown}; choose from {STAGES}")
+    stages = [stage for stage in STAGES if stage in (args.stages or STAGES)]
+
+    results = []
+    for stage in stages:
+        print(f"{'🎙️ Recording' if args.mode == 'record' else '▶️ Replaying'} {stage}...")
+        results.append(_run_stage(args.mode, stage, args.fixtures, args))
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"📉 {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
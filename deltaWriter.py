@@ -0,0 +1,225 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import time
+import hashlib
+import secrets
+from datetime import datetime
+import gspread
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+from runtime import DATA_DIR
+from sheetsGateway import get_gateway
+from sheetSnapshot import loaded_column
+
+# 🔹 Delta writes
+# The last values published to each cell are kept on disk. A write compares the new block(s) with
+# them and only sends the cells that changed, coalesced into rectangles (short gaps of unchanged
+# cells are re-sent to keep the range count down), all in one batch update. A row whose ticker
+# differs from the one recorded (rows inserted or re-sorted by hand) is always rewritten, and each
+# sheet is fully rewritten once every DELTA_FULL_REFRESH_HOURS to pick up any manual edits.
+# The state file can be stale (a failed or overlapping run restored an older copy), so every delta
+# also writes a fresh publish stamp for the sheet to the PUBLISH_STAMP_TAB tab, in the same request.
+# A sheet whose stamp doesn't match the one recorded locally (or can't be found) is rewritten in
+# full, and so is one whose ticker column, as read earlier in this run, no longer matches.
+
+PUBLISHED_STATE_PATH = os.getenv("PUBLISHED_STATE_PATH", os.path.join(DATA_DIR, "published_cells.json"))
+DELTA_WRITES = os.getenv("DELTA_WRITES", "1").lower() in ("1", "true", "yes")
+DELTA_FULL_REFRESH_HOURS = float(os.getenv("DELTA_FULL_REFRESH_HOURS", "24"))
+MAX_GAP_CELLS = 2  # Unchanged cells re-sent to join two changed runs in the same row
+TICKER_COLUMN = "Symbol"
+PUBLISH_STAMP_TAB = os.getenv("PUBLISH_STAMP_TAB", "Publish_Stamps")
+STAMP_HEADERS = ["Sheet", "Published"]
+
+_state = None  # {sheet: {"cells": {a1: value}, "rows": {row: key}, "written_at": epoch seconds, "fingerprint": str, "stamp": str}}
+_stamps = None  # {sheet: (row on the stamp tab, stamp)}, read once per process
+
+
+def _load_state():
+    global _state
+    if _state is None:
+        try:
+            with open(PUBLISHED_STATE_PATH) as f:
+                _state = json.load(f)
+        except (OSError, ValueError):
+            _state = {}
+    return _state
+
+
+def _save_state():
+    os.makedirs(os.path.dirname(PUBLISHED_STATE_PATH) or ".", exist_ok=True)
+    with open(PUBLISHED_STATE_PATH, "w") as f:
+        json.dump(_state, f)
+
+
+def _cell(value):
+    return "" if value is None else value
+
+
+def _fingerprint(tickers):
+    """Ticker column (trailing blanks ignored) -> short digest covering the row count and order."""
+    tickers = [str(ticker) for ticker in tickers]
+    while tickers and tickers[-1] == "":
+        tickers.pop()
+    return hashlib.sha1("\n".join(tickers).encode()).hexdigest()[:16]
+
+
+def _new_stamp():
+    return f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {secrets.token_hex(4)}"
+
+
+def _read_stamps(spreadsheet):
+    """{sheet: (row, stamp)} from the stamp tab, or None when the tab doesn't exist yet."""
+    try:
+        response = spreadsheet.values_batch_get([f"'{PUBLISH_STAMP_TAB}'!A:B"])
+    except gspread.exceptions.APIError as e:
+        if e.code != 400:  # ✅ 400 "Unable to parse range": the tab hasn't been created
+            raise
+        return None
+    values = response["valueRanges"][0].get("values", [])
+    return {row[0]: (number, row[1] if len(row) > 1 else "")
+            for number, row in enumerate(values[1:], start=2) if row and row[0]}
+
+
+def _create_stamp_tab(spreadsheet):
+    worksheet = spreadsheet.add_worksheet(title=PUBLISH_STAMP_TAB, rows=100, cols=len(STAMP_HEADERS))
+    worksheet.update(values=[STAMP_HEADERS], range_name="A1")
+
+
+def _load_stamps(gateway):
+    global _stamps
+    if _stamps is None:
+        _stamps = gateway.read(None, _read_stamps)
+        if _stamps is None:
+            print(f"🆕 Creating the '{PUBLISH_STAMP_TAB}' tab for publish stamps")
+            gateway.write(None, _create_stamp_tab)
+            _stamps = {}
+    return _stamps
+
+
+def _target_cells(blocks):
+    """[(row_values, start_col)] -> {(row, col): value} (1-based, like the sheet)."""
+    cells = {}
+    for row_values, start_col in blocks:
+        first_col = a1_to_rowcol(f"{start_col}1")[1]
+        for row, values in row_values.items():
+            for offset, value in enumerate(values):
+                cells[(row, first_col + offset)] = _cell(value)
+    return cells
+
+
+def _row_runs(columns, row, target):
+    """Sorted changed columns of one row -> [(first_col, last_col)], bridging short gaps."""
+    runs = []
+    for col in columns:
+        if runs:
+            first, last = runs[-1]
+            gap = range(last + 1, col)
+            if len(gap) <= MAX_GAP_CELLS and all((row, c) in target for c in gap):
+                runs[-1] = (first, col)
+                continue
+        runs.append((col, col))
+    return runs
+
+
+def coalesce(changed, target):
+    """Changed (row, col) cells -> batch_update ranges; equal column spans on consecutive rows are merged."""
+    columns_by_row = {}
+    for row, col in changed:
+        columns_by_row.setdefault(row, []).append(col)
+
+    rectangles = []  # [first_row, last_row, first_col, last_col]
+    open_spans = {}  # {(first_col, last_col): rectangle still growing downwards}
+    for row in sorted(columns_by_row):
+        spans = _row_runs(sorted(columns_by_row[row]), row, target)
+        grown = {}
+        for span in spans:
+            rectangle = open_spans.get(span)
+            if rectangle is not None and rectangle[1] == row - 1:
+                rectangle[1] = row
+            else:
+                rectangle = [row, row, *span]
+                rectangles.append(rectangle)
+            grown[span] = rectangle
+        open_spans = grown
+
+    return [
+        {
+            "range": f"{rowcol_to_a1(first_row, first_col)}:{rowcol_to_a1(last_row, last_col)}",
+            "values": [[target[(row, col)] for col in range(first_col, last_col + 1)]
+                       for row in range(first_row, last_row + 1)],
+        }
+        for first_row, last_row, first_col, last_col in rectangles
+    ]
+
+
+def plan_delta(sheet_name, blocks, row_keys=None, observed=None, sheet_stamp=None):
+    """Return (updates, target cells, full rewrite?) for writing `blocks` to `sheet_name`.
+
+    `observed` is the ticker column as read from the sheet in this run (None if it wasn't read) and
+    `sheet_stamp` the publish stamp found on the sheet (None if there is none).
+    """
+    state = _load_state().get(sheet_name)
+    target = _target_cells(blocks)
+    full = (not DELTA_WRITES or state is None
+            or time.time() - state.get("written_at", 0) > DELTA_FULL_REFRESH_HOURS * 3600)
+    if not full and (sheet_stamp is None or state.get("stamp") != sheet_stamp):
+        print(f"🔄 {sheet_name}: publish stamp on the sheet doesn't match the local state, rewriting in full")
+        full = True
+    if not full and observed is not None and state.get("fingerprint") != _fingerprint(observed):
+        print(f"🔄 {sheet_name}: tickers / row count differ from the last recorded publish, rewriting in full")
+        full = True
+
+    if full:
+        changed = list(target)
+    else:
+        published = state["cells"]
+        recorded_rows = state.get("rows", {})
+        moved = {row for row, key in (row_keys or {}).items() if recorded_rows.get(str(row)) != key}
+        changed = [
+            (row, col) for (row, col), value in target.items()
+            if row in moved or published.get(rowcol_to_a1(row, col), None) != value
+        ]
+    return coalesce(changed, target), target, full
+
+
+def _record(sheet_name, target, row_keys=None, full=False, fingerprint=None, stamp=None):
+    state = _load_state()
+    if sheet_name not in state:
+        state[sheet_name] = {"cells": {}, "rows": {}, "written_at": time.time()}
+    entry = state[sheet_name]
+    entry["cells"].update({rowcol_to_a1(row, col): value for (row, col), value in target.items()})
+    entry["rows"].update({str(row): key for row, key in (row_keys or {}).items()})
+    if full:
+        entry["written_at"] = time.time()
+    if fingerprint is not None:
+        entry["fingerprint"] = fingerprint
+    entry["stamp"] = stamp
+    _save_state()
+
+
+# 🔹 Function the stages use instead of rewriting whole ranges
+def write_delta(sheet_name, blocks, gateway=None, row_keys=None):
+    """Write [(row_values {row: [values]}, start_col)] to `sheet_name`, sending only changed cells.
+
+    `row_keys` ({row: ticker}) forces rows whose ticker changed to be rewritten.
+    Returns the number of cells sent. API errors propagate to the caller.
+    """
+    gateway = gateway or get_gateway()
+    stamps = _load_stamps(gateway)
+    stamp_row, stamp = stamps.get(sheet_name, (None, None))
+    observed = loaded_column(sheet_name, TICKER_COLUMN)
+    updates, target, full = plan_delta(sheet_name, blocks, row_keys, observed, stamp)
+
+    if updates:
+        # ✅ The changed cells and the sheet's new publish stamp go out in one request
+        stamp_row = stamp_row or max((row for row, _ in stamps.values()), default=1) + 1
+        stamp = _new_stamp()
+        data = [{"range": f"'{sheet_name}'!{update['range']}", "values": update["values"]} for update in updates]
+        data.append({"range": f"'{PUBLISH_STAMP_TAB}'!A{stamp_row}:B{stamp_row}", "values": [[sheet_name, stamp]]})
+        gateway.write(None, lambda ss: ss.values_batch_update(body={"valueInputOption": "RAW", "data": data}))
+        stamps[sheet_name] = (stamp_row, stamp)
+
+    sent = sum(len(update["values"]) * len(update["values"][0]) for update in updates)
+    _record(sheet_name, target, row_keys, full=full,
+            fingerprint=_fingerprint(observed) if observed is not None else None, stamp=stamp)
+    print(f"✏️ {sheet_name}: {'full rewrite' if full else 'delta'} of {sent}/{len(target)} cells in {len(updates)} ranges")
+    return sent
@@ -0,0 +1,404 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import time
+import threading
+from collections import deque
+import gspread
+import requests
+from gspread.utils import a1_range_to_grid_range, numericise_all, rowcol_to_a1
+import sheetsGateway
+
+# 🔹 In-memory Google Sheets stand-in
+# Implements the part of the gspread surface the scripts use, keeps the cells in memory, enforces
+# per-minute read/write quotas per credential (raising the same 429 APIError as Google) and counts
+# requests and payload bytes. `install()` puts it behind the shared gateway, so any stage can be run,
+# profiled or load-tested locally:
+#
+#   workbook = FakeWorkbook({"Large Cap": [["Symbol", ...], ["AAPL", ...]]})
+#   install(workbook, credentials=2, read_quota=30)
+#   import scoreUpdate; scoreUpdate.run()
+#   print(workbook.stats())
+#
+# Values are stored as written and read back as display strings; the grid grows to fit any write.
+
+FAKE_READ_QUOTA = int(os.getenv("FAKE_SHEETS_READ_QUOTA", "60"))
+FAKE_WRITE_QUOTA = int(os.getenv("FAKE_SHEETS_WRITE_QUOTA", "60"))
+QUOTA_WINDOW_SECONDS = 60
+DEFAULT_ROWS, DEFAULT_COLS = 1000, 26
+
+
+def _display(value):
+    """Cell value as the API returns it (FORMATTED_VALUE)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(rows):
+    """Drop trailing empty cells and rows, like the values API."""
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def _size(payload):
+    return len(json.dumps(payload, default=str).encode()) if payload is not None else 0
+
+
+def api_error(code, status, message):
+    """An APIError shaped like the ones Google returns."""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": status}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+def quota_error(kind):
+    """The 429 APIError Google returns when a per-minute quota is exhausted."""
+    return api_error(429, "RESOURCE_EXHAUSTED",
+                     f"Quota exceeded for quota metric '{kind.title()} requests' and limit "
+                     f"'{kind.title()} requests per minute per user' of service 'sheets.googleapis.com'")
+
+
+class FakeTab:
+    """Cells, grid size and formatting of one tab."""
+
+    def __init__(self, title, sheet_id, index, rows=None):
+        self.title = title
+        self.sheet_id = sheet_id
+        self.index = index
+        self.cells = {}  # {(row, col): value}, 0-based
+        self.row_count, self.col_count = DEFAULT_ROWS, DEFAULT_COLS
+        self.conditional_formats = []
+        self.formats = []
+        self.write_block(0, 0, rows or [])
+
+    def used_extent(self):
+        rows = max((row for row, _ in self.cells), default=-1) + 1
+        cols = max((col for _, col in self.cells), default=-1) + 1
+        return rows, cols
+
+    def write_block(self, row, col, values):
+        for r, row_values in enumerate(values):
+            for c, value in enumerate(row_values):
+                if value is None or value == "":
+                    self.cells.pop((row + r, col + c), None)
+                else:
+                    self.cells[(row + r, col + c)] = value
+        self.row_count = max(self.row_count, row + len(values))
+        self.col_count = max(self.col_count, col + max((len(v) for v in values), default=0))
+
+    def read_grid(self, grid, columns=False):
+        """Display values for a GridRange (open ends run to the used extent)."""
+        used_rows, used_cols = self.used_extent()
+        row_range = range(grid.get("startRowIndex", 0), min(grid.get("endRowIndex", used_rows), max(used_rows, 0)))
+        col_range = range(grid.get("startColumnIndex", 0), min(grid.get("endColumnIndex", used_cols), max(used_cols, 0)))
+        rows = [[_display(self.cells.get((r, c))) for c in col_range] for r in row_range]
+        if columns:
+            rows = [list(column) for column in zip(*rows)] if rows else []
+        return _trim(rows)
+
+    def clear(self):
+        self.cells.clear()
+
+    def properties(self):
+        return {"sheetId": self.sheet_id, "title": self.title, "index": self.index, "sheetType": "GRID",
+                "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count}}
+
+
+class FakeWorkbook:
+    """The spreadsheet's contents, shared by every credential's client."""
+
+    def __init__(self, tabs=None, title=sheetsGateway.SPREADSHEET_NAME, spreadsheet_id="fake-spreadsheet"):
+        self.title = title
+        self.id = spreadsheet_id
+        self.tabs = {}
+        self.clients = []
+        self.lock = threading.RLock()
+        for name, rows in (tabs or {}).items():
+            self.add_tab(name, rows)
+
+    def add_tab(self, title, rows=None):
+        self.tabs[title] = FakeTab(title, len(self.tabs), len(self.tabs), rows)
+        return self.tabs[title]
+
+    def tab(self, title):
+        if title not in self.tabs:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def values(self, title):
+        """Everything on a tab as display strings (for assertions)."""
+        return self.tab(title).read_grid({})
+
+    def stats(self):
+        """Request and payload totals over every credential."""
+        totals = {}
+        for client in self.clients:
+            for key, value in client.stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class FakeClient:
+    """One service account: its own per-minute quotas and request counters."""
+
+    def __init__(self, workbook, read_quota=FAKE_READ_QUOTA, write_quota=FAKE_WRITE_QUOTA, clock=time.monotonic):
+        self.workbook = workbook
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.window = {"read": deque(), "write": deque()}
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.stats = {"read": 0, "write": 0, "rejected": 0, "drive_searches": 0, "bytes_sent": 0, "bytes_received": 0}
+        workbook.clients.append(self)
+
+    def request(self, kind, sent, produce):
+        """Run one API request: quota check, then `produce()` under the workbook lock, then byte counts."""
+        with self.lock:
+            now = self.clock()
+            window = self.window[kind]
+            while window and now - window[0] >= QUOTA_WINDOW_SECONDS:
+                window.popleft()
+            if len(window) >= self.quotas[kind]:
+                self.stats["rejected"] += 1
+                raise quota_error(kind)
+            window.append(now)
+            self.stats[kind] += 1
+        with self.workbook.lock:
+            response = produce()
+        with self.lock:
+            self.stats["bytes_sent"] += _size(sent)
+            self.stats["bytes_received"] += _size(response)
+        return response
+
+    def open(self, title, folder_id=None):
+        with self.lock:
+            self.stats["drive_searches"] += 1
+        if title != self.workbook.title:
+            raise gspread.exceptions.SpreadsheetNotFound(title)
+        return FakeSpreadsheet(self)
+
+    def open_by_key(self, key):
+        if key != self.workbook.id:
+            raise gspread.exceptions.SpreadsheetNotFound(key)
+        return FakeSpreadsheet(self)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client):
+        self.client = client
+        self.workbook = client.workbook
+        self._metadata = client.request("read", None, self._build_metadata)  # Like gspread, opening reads metadata
+
+    @property
+    def id(self):
+        return self.workbook.id
+
+    @property
+    def title(self):
+        return self.workbook.title
+
+    def _build_metadata(self):
+        return {
+            "spreadsheetId": self.workbook.id,
+            "properties": {"title": self.workbook.title},
+            "sheets": [{"properties": tab.properties(), "conditionalFormats": list(tab.conditional_formats)}
+                       for tab in self.workbook.tabs.values()],
+        }
+
+    def fetch_sheet_metadata(self, params=None):
+        return self.client.request("read", params, self._build_metadata)
+
+    def worksheets(self, exclude_hidden=False):
+        self.client.request("read", None, self._build_metadata)
+        return [FakeWorksheet(self, title) for title in self.workbook.tabs]
+
+    def worksheet(self, title):
+        self.client.request("read", None, self._build_metadata)
+        self.workbook.tab(title)
+        return FakeWorksheet(self, title)
+
+    def _split(self, a1):
+        """"'Tab'!A1:B2" -> (tab, GridRange); an unknown tab fails like the API (400)."""
+        name, _, cells = a1.partition("!")
+        if name.startswith("'") and name.endswith("'"):
+            name = name[1:-1].replace("''", "'")
+        if name not in self.workbook.tabs:
+            raise api_error(400, "INVALID_ARGUMENT", f"Unable to parse range: {a1}")
+        return self.workbook.tab(name), (a1_range_to_grid_range(cells) if cells else {})
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        def produce():
+            tab = self.workbook.add_tab(title)
+            tab.row_count, tab.col_count = rows, cols
+            return {"replies": [{"addSheet": {"properties": tab.properties()}}]}
+
+        self.client.request("write", {"title": title}, produce)
+        return FakeWorksheet(self, title)
+
+    def values_batch_get(self, ranges, params=None):
+        columns = (params or {}).get("majorDimension") == "COLUMNS"
+
+        def produce():
+            value_ranges = []
+            for a1 in ranges:
+                tab, grid = self._split(a1)
+                value_range = {"range": a1, "majorDimension": "COLUMNS" if columns else "ROWS"}
+                values = tab.read_grid(grid, columns)
+                if values:
+                    value_range["values"] = values
+                value_ranges.append(value_range)
+            return {"spreadsheetId": self.workbook.id, "valueRanges": value_ranges}
+
+        return self.client.request("read", {"ranges": ranges, "params": params}, produce)
+
+    def values_batch_update(self, body=None):
+        def produce():
+            responses = []
+            for value_range in body.get("data", []):
+                tab, grid = self._split(value_range["range"])
+                values = value_range["values"]
+                tab.write_block(grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0), values)
+                responses.append({"updatedRange": value_range["range"], "updatedCells": sum(len(row) for row in values)})
+            return {"spreadsheetId": self.workbook.id, "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+                    "responses": responses}
+
+        return self.client.request("write", body, produce)
+
+    def batch_update(self, body):
+        def produce():
+            tabs = {tab.sheet_id: tab for tab in self.workbook.tabs.values()}
+            for request in body.get("requests", []):
+                if "addConditionalFormatRule" in request:
+                    add = request["addConditionalFormatRule"]
+                    tab = tabs[add["rule"]["ranges"][0].get("sheetId", 0)]
+                    tab.conditional_formats.insert(add.get("index", len(tab.conditional_formats)), add["rule"])
+                elif "deleteConditionalFormatRule" in request:
+                    delete = request["deleteConditionalFormatRule"]
+                    tabs[delete["sheetId"]].conditional_formats.pop(delete["index"])
+                elif "repeatCell" in request:
+                    repeat = request["repeatCell"]
+                    tabs[repeat["range"].get("sheetId", 0)].formats.append(repeat)
+            return {"spreadsheetId": self.workbook.id, "replies": [{} for _ in body.get("requests", [])]}
+
+        return self.client.request("write", body, produce)
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.title = title
+
+    @property
+    def _tab(self):
+        return self.spreadsheet.workbook.tab(self.title)
+
+    @property
+    def id(self):
+        return self._tab.sheet_id
+
+    @property
+    def row_count(self):
+        return self._tab.row_count
+
+    @property
+    def col_count(self):
+        return self._tab.col_count
+
+    # 🔹 Reads
+    def get_all_values(self, *args, **kwargs):
+        def produce():
+            rows = self._tab.read_grid({})
+            width = max((len(row) for row in rows), default=0)
+            return [row + [""] * (width - len(row)) for row in rows]
+        return self.client.request("read", None, produce)
+
+    def get_all_records(self, head=1, default_blank="", numericise_ignore=(), **kwargs):
+        rows = self.get_all_values()
+        if len(rows) < head:
+            return []
+        keys = rows[head - 1]
+        ignore = [] if "all" in numericise_ignore else [index for index in numericise_ignore if isinstance(index, int)]
+        return [
+            dict(zip(keys, row if "all" in numericise_ignore else numericise_all(row, default_blank=default_blank, ignore=ignore)))
+            for row in rows[head:]
+        ]
+
+    def row_values(self, row, **kwargs):
+        return self.client.request("read", None, lambda: (self._tab.read_grid(a1_range_to_grid_range(f"{row}:{row}")) or [[]])[0])
+
+    def col_values(self, col, **kwargs):
+        letter = rowcol_to_a1(1, col)[:-1]
+        return self.client.request("read", None, lambda: [
+            (row or [""])[0] for row in self._tab.read_grid(a1_range_to_grid_range(f"{letter}:{letter}"))
+        ])
+
+    def acell(self, label, **kwargs):
+        grid = a1_range_to_grid_range(label)
+        value = self.client.request("read", None, lambda: _display(
+            self._tab.cells.get((grid["startRowIndex"], grid["startColumnIndex"]))))
+        return gspread.Cell(grid["startRowIndex"] + 1, grid["startColumnIndex"] + 1, value)
+
+    # 🔹 Writes
+    def _write(self, range_name, values):
+        grid = a1_range_to_grid_range(range_name)
+        self._tab.write_block(grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0), values)
+        return {
+            "updatedRange": f"'{self.title}'!{range_name}",
+            "updatedRows": len(values),
+            "updatedColumns": max((len(row) for row in values), default=0),
+            "updatedCells": sum(len(row) for row in values),
+        }
+
+    def update(self, values=None, range_name=None, **kwargs):
+        if isinstance(values, str) or isinstance(range_name, list):  # Old update("A1", values) argument order
+            values, range_name = range_name, values
+        range_name = range_name or "A1"
+        if not isinstance(values, list) or (values and not isinstance(values[0], list)):
+            values = [[values]] if not isinstance(values, list) else [values]
+        return self.client.request("write", {"range": range_name, "values": values},
+                                   lambda: dict(self._write(range_name, values), spreadsheetId=self.spreadsheet.id))
+
+    def batch_update(self, data, **kwargs):
+        def produce():
+            responses = [self._write(update["range"], update["values"]) for update in data]
+            return {"spreadsheetId": self.spreadsheet.id, "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+                    "responses": responses}
+        return self.client.request("write", {"data": data}, produce)
+
+    def append_row(self, values, **kwargs):
+        def produce():
+            next_row = self._tab.used_extent()[0] + 1
+            return {"updates": self._write(f"A{next_row}", [list(values)])}
+        return self.client.request("write", {"values": [values]}, produce)
+
+    def clear(self):
+        return self.client.request("write", None, lambda: self._tab.clear() or {"clearedRange": self.title})
+
+    def format(self, ranges, format, **kwargs):
+        ranges = [ranges] if isinstance(ranges, str) else ranges
+        return self.client.request("write", {"ranges": ranges, "format": format},
+                                   lambda: self._tab.formats.extend({"range": r, "format": format} for r in ranges) or {})
+
+
+# 🔹 Function to run the scripts against the fake
+def install(workbook, credentials=2, read_quota=FAKE_READ_QUOTA, write_quota=FAKE_WRITE_QUOTA, clock=time.monotonic):
+    """Route the shared gateway to `workbook` through `credentials` fake service accounts and return it.
+
+    Call before importing a stage (they bind the gateway at import). The gateway paces itself at
+    SHEETS_READ_QUOTA / SHEETS_WRITE_QUOTA; set the fake's quotas lower to exercise the 429 paths.
+    """
+    sources = [f"fake-credentials-{number}" for number in range(1, credentials + 1)]
+    for source in sources:
+        sheetsGateway._clients[source] = FakeClient(workbook, read_quota, write_quota, clock)
+    sheetsGateway._gateway = sheetsGateway.SheetsGateway(sources, spreadsheet_name=workbook.title, spreadsheet_id=workbook.id)
+    return sheetsGateway._gateway
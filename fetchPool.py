@@ -0,0 +1,58 @@
+import os  # Required for environment variables
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 🔹 yfinance request budget (override from the workflow environment)
+YF_REQUESTS_PER_SECOND = float(os.getenv("YF_REQUESTS_PER_SECOND", "5"))
+YF_BURST = int(os.getenv("YF_BURST", "10"))
+YF_MAX_IN_FLIGHT = int(os.getenv("YF_MAX_IN_FLIGHT", "4"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker that talks to the same upstream."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` requests may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    wait = (tokens - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def backoff(self, seconds):
+        """Pause every worker after a rate-limit response and start again from an empty bucket."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+
+# ✅ One global bucket for all yfinance traffic in the process
+yf_limiter = TokenBucket(YF_REQUESTS_PER_SECOND, YF_BURST)
+
+
+# 🔹 Run a per-ticker fetch function on a bounded thread pool
+def fetch_concurrently(fn, items, max_workers=YF_MAX_IN_FLIGHT):
+    """Return {item: fn(item)} with at most `max_workers` calls in flight."""
+    items = list(dict.fromkeys(items))
+    if not items:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(items, pool.map(fn, items)))
@@ -0,0 +1,109 @@
+import os  # Required for environment variables
+import json
+import sqlite3
+import threading
+import time
+from runtime import DATA_DIR, lazy_import
+from fetchPool import yf_limiter
+
+yf = lazy_import("yfinance")  # ✅ Only imported when a field has to be fetched
+
+# 🔹 Shared on-disk cache for yfinance `stock.info` (the slowest, most rate-limited call)
+FUNDAMENTALS_CACHE_PATH = os.getenv("FUNDAMENTALS_CACHE_PATH", os.path.join(DATA_DIR, "fundamentals.sqlite"))
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# 🔹 How long each `info` field stays valid (seconds)
+FIELD_TTL = {
+    # Classification (monthly)
+    "industry": 30 * DAY,
+    "sector": 30 * DAY,
+    "longName": 30 * DAY,
+    # Earnings (daily)
+    "earningsTimestamp": DAY,
+    "earningsTimestampStart": DAY,
+    "trailingEps": DAY,
+    "epsCurrentYear": DAY,
+    "epsForward": DAY,
+    "revenueGrowth": DAY,
+    "debtToEquity": DAY,
+    "totalDebt": DAY,
+    "earningsQuarterlyGrowth": DAY,
+    # Short interest (daily)
+    "floatShares": DAY,
+    "shortPercentOfFloat": DAY,
+    "shortPercentFloat": DAY,
+    "shortRatio": DAY,
+    # Valuation
+    "marketCap": DAY,
+    "trailingPE": DAY,
+    "regularMarketPrice": HOUR,
+}
+DEFAULT_TTL = DAY
+
+_connection = None
+_lock = threading.Lock()
+
+
+def get_connection():
+    """Open (once) the fundamentals cache and make sure the schema exists."""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(FUNDAMENTALS_CACHE_PATH) or ".", exist_ok=True)
+        _connection = sqlite3.connect(FUNDAMENTALS_CACHE_PATH, check_same_thread=False)
+        _connection.execute(
+            """CREATE TABLE IF NOT EXISTS fundamentals (
+                ticker TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (ticker, field)
+            )"""
+        )
+        _connection.commit()
+    return _connection
+
+
+def _read_cached(ticker, fields):
+    """Return {field: (value, fetched_at)} for whatever is cached."""
+    conn = get_connection()
+    placeholders = ",".join("?" for _ in fields)
+    with _lock:
+        rows = conn.execute(
+            f"SELECT field, value, fetched_at FROM fundamentals WHERE ticker = ? AND field IN ({placeholders})",
+            (ticker, *fields),
+        ).fetchall()
+    return {field: (json.loads(value), fetched_at) for field, value, fetched_at in rows}
+
+
+def _store(ticker, info, fields):
+    """Cache every known field from a fresh `info` payload (absent fields are cached as None)."""
+    conn = get_connection()
+    now = time.time()
+    rows = [(ticker, field, json.dumps(info.get(field), default=str), now)
+            for field in set(FIELD_TTL) | set(fields)]
+    with _lock:
+        conn.executemany("INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+# 🔹 Function every `stock.info` consumer reads through
+# With allow_fetch=False (price-only runs) whatever is cached is returned, however old.
+# Fields yfinance does not provide are left out, so callers keep using `.get(field, "N/A")`.
+def get_fundamentals(ticker, fields, allow_fetch=True):
+    """Return {field: value} for the requested `info` fields, calling yfinance only when one is stale."""
+    cached = _read_cached(ticker, fields)
+    now = time.time()
+    is_fresh = all(
+        field in cached and now - cached[field][1] < FIELD_TTL.get(field, DEFAULT_TTL)
+        for field in fields
+    )
+
+    if not is_fresh and allow_fetch:
+        yf_limiter.acquire()
+        info = yf.Ticker(ticker).info  # ⚠️ Rate-limit errors propagate to the caller's retry loop
+        _store(ticker, info, fields)
+        return {field: info[field] for field in fields if info.get(field) is not None}
+
+    return {field: value for field, (value, _) in cached.items() if value is not None}
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# 🔹 Vectorized indicator engine
+# Every ticker's history is right-aligned into a (bars × tickers) panel so that row -1 is each
+# ticker's latest bar, row -2 the bar before, and so on. All indicators are then computed for the
+# whole universe with column-wise NumPy/pandas operations instead of one Series at a time.
+
+PANEL_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def build_panels(histories):
+    """Turn {ticker: OHLCV DataFrame} into {field: DataFrame(bars × tickers)}, right-aligned by bar."""
+    tickers = [t for t, hist in histories.items() if hist is not None and not hist.empty]
+    length = max((len(histories[t]) for t in tickers), default=0)
+    panels = {}
+    for field in PANEL_FIELDS:
+        values = np.full((length, len(tickers)), np.nan)
+        for j, ticker in enumerate(tickers):
+            column = histories[ticker][field].to_numpy(dtype=float) if field in histories[ticker] else np.nan
+            values[length - len(histories[ticker]):, j] = column
+        panels[field] = pd.DataFrame(values, columns=tickers)
+    return panels
+
+
+def _last(panel, offset=1):
+    """Value `offset` bars from the end for every ticker (NaN where the history is too short)."""
+    if len(panel) < offset:
+        return pd.Series(np.nan, index=panel.columns)
+    return panel.iloc[-offset]
+
+
+def _first_valid(panel):
+    """First bar of each ticker's own history."""
+    values = panel.to_numpy()
+    valid = ~np.isnan(values)
+    rows = valid.argmax(axis=0)
+    first = values[rows, np.arange(values.shape[1])] if values.size else np.array([])
+    return pd.Series(np.where(valid.any(axis=0), first, np.nan), index=panel.columns)
+
+
+def _pct_change(current, previous):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ((current - previous) / previous * 100).round(2)
+
+
+def rsi_panel(close, period=14):
+    """Simple-average RSI for every ticker (same maths as the old per-Series calculate_rsi)."""
+    delta = close.diff()
+    valid = close.notna()
+    gain = delta.where(delta > 0, 0).where(valid).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).where(valid).rolling(window=period).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def vwma_panel(close, volume, period=20):
+    """Volume weighted moving average for every ticker."""
+    return (close * volume).rolling(window=period).sum() / volume.rolling(window=period).sum()
+
+
+def true_range_atr_panel(high, low, close, period=14):
+    """ATR based on the true range (high/low and gaps against the previous close)."""
+    previous_close = close.shift()
+    true_range = np.maximum(high - low, np.maximum((high - previous_close).abs(), (low - previous_close).abs()))
+    return true_range.where(high.notna()).rolling(period).mean()
+
+
+def compute_indicators(histories):
+    """Compute every indicator for the whole universe in one pass, returning a frame indexed by ticker."""
+    panels = build_panels(histories)
+    close, volume = panels["Close"], panels["Volume"]
+    high, low, open_ = panels["High"], panels["Low"], panels["Open"]
+    if close.empty:
+        return pd.DataFrame()
+    lengths = close.notna().sum()
+
+    current_price = _last(close)
+    yesterday_close = _last(close, 2).where(lengths > 1)
+    # Fall back to yesterday's close when the latest bar has no price yet
+    current_price = current_price.where((current_price != 0) & current_price.notna(), yesterday_close)
+
+    week_ago = _last(close, 6).where(lengths > 6)
+    latest_volume = _last(volume)
+    vwma = _last(vwma_panel(close, volume, period=20)).where(lengths >= 20)
+    atr = _last((high - low).rolling(14).mean())
+
+    avg20_volume = volume.iloc[-21:-1].mean() if len(volume) > 21 else pd.Series(np.nan, index=close.columns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rvol = (latest_volume / avg20_volume.replace(0, np.nan)).where(lengths > 21).round(2)
+        rel_atr = (atr / current_price.replace(0, np.nan)).round(4)
+        gap_pct = (_last(open_) - yesterday_close) / yesterday_close * 100
+
+    result = pd.DataFrame({
+        "current_price": current_price,
+        "yesterday_close": yesterday_close,
+        "pct_change_1d": _pct_change(current_price, yesterday_close),
+        "pct_change_1wk": _pct_change(current_price, week_ago),
+        "pct_change_1mo": _pct_change(current_price, _first_valid(close)),
+        "pct_change_22d": _pct_change(current_price, _last(close, 22).where(lengths > 22)),
+        "pct_change_66d": _pct_change(current_price, _last(close, 66).where(lengths > 66)),
+        "volume": latest_volume,
+        "rsi": _last(rsi_panel(close, period=14)),
+        "vwma": vwma,
+        "ema": _last(close.ewm(span=10, adjust=False).mean()),
+        "ema20": _last(close.ewm(span=20, adjust=False).mean()),
+        "atr": atr,
+        "atr_true_range": _last(true_range_atr_panel(high, low, close, period=14)),
+        "rvol": rvol,
+        "dollar_volume": (current_price * latest_volume).round(0),
+        "gap_pct": gap_pct.where(lengths > 1),
+        "dist_to_vwap": (current_price - vwma).round(2),
+        "rel_atr": rel_atr,
+    })
+    result.index.name = "ticker"
+    return result.replace([np.inf, -np.inf], np.nan)
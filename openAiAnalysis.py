@@ -1,53 +1,29 @@
 import os
-import json
-import gspread
 import time
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from openai import OpenAI
 from datetime import datetime
-from oauth2client.service_account import ServiceAccountCredentials
 import requests
-
-# 🔹 Google Sheets API Setup
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+from priceStore import load_history
+from fundamentalsCache import get_fundamentals
+from sheetsGateway import SheetsGateway
+from runtime import get_openai_client
 
 # 🔹 Load credentials from local JSON files
 CREDS_FILE_1 = r"C:\Users\venka\Downloads\stock-analysis-447717-f449ebc79388.json"
 CREDS_FILE_2 = r"C:\Users\venka\Downloads\stock-analysis-447717-6d99fc514040.json"
 
-# 🔹 OpenAI API Key (Set in Environment Variables)
-OPENAI_API_KEY = ""
-
-# ✅ Initialize OpenAI Client
-client_ai = OpenAI(api_key=OPENAI_API_KEY)
-
-# 🔹 Function to authenticate with Google Sheets
-def authenticate_with_json(json_file):
-    creds = ServiceAccountCredentials.from_json_keyfile_name(json_file, SCOPE)
-    return gspread.authorize(creds)
-
-# Start with API Key 1
-client = authenticate_with_json(CREDS_FILE_1)
-active_api = 1  # Track which API key is being used
-
-# 🔹 Function to switch API keys when hitting rate limits
-def switch_api_key():
-    global active_api, client
-    active_api = 2 if active_api == 1 else 1  # Toggle API key
-    client = authenticate_with_json(CREDS_FILE_2 if active_api == 2 else CREDS_FILE_1)
-    print(f"🔄 Switched to API Key {active_api}")
+# 🔹 OpenAI API Key (Set in Environment Variables; the client is created on the first AI call)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Open the spreadsheet and access the 'Top Picks' sheet
-sheet = client.open("Stock Investment Analysis")
-top_picks_ws = sheet.worksheet("Top Picks")
+# 🔹 Google Sheets access goes through the shared quota-aware gateway
+gateway = SheetsGateway([CREDS_FILE_1, CREDS_FILE_2])
 
-print("✅ Successfully authenticated with Google Sheets and OpenAI!")
+print("✅ Successfully authenticated with Google Sheets!")
 
 # 🔹 Fetch existing data
 def fetch_existing_data():
-    return top_picks_ws.get_all_values()
+    return gateway.read("Top Picks", lambda ws: ws.get_all_values())
 
 
 existing_data = fetch_existing_data()
@@ -59,8 +35,8 @@ new_headers = ["Rank", "Symbol", "AI Decision(Buy/Hold/Sell)", "AI Recommended B
 updated_data = [new_headers] + [[row[0], row[1], "", "", "", "", ""] + row[2:] for row in existing_data[1:]]
 
 # 🔹 Update Google Sheets with existing data structure first
-top_picks_ws.clear()
-top_picks_ws.update("A1", updated_data)
+gateway.write("Top Picks", lambda ws: ws.clear())
+gateway.write("Top Picks", lambda ws: ws.update("A1", updated_data))
 print("✅ Google Sheet updated successfully with previous logic!")
 
 # 🔹 Function to fetch missing data from the web
@@ -95,18 +71,17 @@ def parse_ai_analysis(ai_analysis):
     return decision, buy_price, sell_price, technical_summary, rest_of_ai_analysis
 
 # 🔹 Function to analyze stock with historical data
-def analyze_stock(ticker):
+def analyze_stock(ticker, hist):
     print(f"🔍 Analyzing {ticker}...")
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period="6mo")
     if hist.empty:
         print(f"⚠️ No historical data for {ticker}, fetching from web...")
         web_data = fetch_web_data(ticker)
         return [ticker, "No data from Yahoo", web_data, "", ""]
     
-    market_cap = stock.info.get("marketCap", "N/A")
-    current_price = stock.info.get("regularMarketPrice", "N/A")
-    pe_ratio = stock.info.get("trailingPE", "N/A")
+    info = get_fundamentals(ticker, ["marketCap", "regularMarketPrice", "trailingPE"])
+    market_cap = info.get("marketCap", "N/A")
+    current_price = info.get("regularMarketPrice", "N/A")
+    pe_ratio = info.get("trailingPE", "N/A")
     
     # Fetch historical data
     hist_high = hist["High"].max() if not hist.empty else "N/A"
@@ -127,7 +102,7 @@ def analyze_stock(ticker):
     3️⃣ Recommended Sell Price (numeric value or range)
     4️⃣ Technical Indicators Summary
     """
-    response = client_ai.chat.completions.create(
+    response = get_openai_client(OPENAI_API_KEY).chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are a professional stock analyst specializing in high-growth, low-risk investments. Ensure all price recommendations include numeric values and leverage both real-time and historical data. If any data is missing, search the web to obtain better insights."},
@@ -142,10 +117,11 @@ def analyze_stock(ticker):
 
 # 🔹 Process stocks and update Google Sheets
 tickers = [row[1] for row in existing_data[1:] if len(row) > 1]
+histories = load_history(tickers, period="6mo")  # ✅ Read 6 months of history from the local price store
 for i, ticker in enumerate(tickers, start=2):
-    stock_data = analyze_stock(ticker)
+    stock_data = analyze_stock(ticker, histories.get(ticker, pd.DataFrame()))
     if stock_data:
-        top_picks_ws.update(f"C{i}:G{i}", [stock_data])
+        gateway.write("Top Picks", lambda ws: ws.update(f"C{i}:G{i}", [stock_data]))
     time.sleep(5)
 
 print("✅ Google Sheet updated successfully with AI analysis!")
@@ -0,0 +1,53 @@
+import sys
+import time
+import importlib
+from sheetSnapshot import read_snapshot
+
+# 🔹 In-process end-to-end pipeline
+# Runs the stage scripts one after another in a single process: one Sheets client, one read of every
+# tab the stages use, and DataFrames handed from stage to stage in memory. Sheets are only written as
+# publish steps; each publish also patches the in-process snapshot so the next stage reads nothing.
+# The scripts still work on their own (python fetchData.py, ...).
+#
+#   python pipeline.py                        # every stage
+#   python pipeline.py scoreUpdate updateTop  # a subset, still in pipeline order
+
+STAGES = ["fetchData", "updateEarnings", "scoreUpdate", "updateHybrid", "updateTop", "AiAnalysis"]
+
+# Stage -> earlier stage whose return value it takes as input (typed DataFrames)
+HANDOFF = {"updateTop": "updateHybrid"}
+
+# Every tab any stage reads (Hybrid, Super Green & Top Picks are rebuilt in memory before they are read)
+PRELOAD_TABS = ["SP Tracker", "Large Cap", "Mid Cap", "Technology", "Top Picks"]
+
+
+def run_pipeline(stages=STAGES):
+    """Run the selected stages in order and return {stage: its return value}."""
+    stages = [stage for stage in STAGES if stage in stages]
+    started = time.perf_counter()
+
+    # ✅ One batched read for the whole run
+    read_snapshot({tab: None for tab in PRELOAD_TABS})
+
+    outputs, timings = {}, {}
+    for stage in stages:
+        print(f"\n🚀 Stage: {stage}")
+        stage_started = time.perf_counter()
+        module = importlib.import_module(stage)  # ✅ Imported on demand (heavy dependencies load on first use)
+        source = HANDOFF.get(stage)
+        outputs[stage] = module.run(outputs[source]) if source in outputs else module.run()
+        timings[stage] = time.perf_counter() - stage_started
+
+    print("\n⏱️ Pipeline timings:")
+    for stage, seconds in timings.items():
+        print(f"   {stage}: {seconds:.1f}s")
+    print(f"✅ Pipeline finished in {time.perf_counter() - started:.1f}s")
+    return outputs
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or STAGES
+    unknown = [stage for stage in selected if stage not in STAGES]
+    if unknown:
+        sys.exit(f"❌ Unknown stage(s) {unknown}; choose from {STAGES}")
+    run_pipeline(selected)
@@ -0,0 +1,205 @@
+import os  # Required for environment variables
+import sqlite3
+import pandas as pd
+from datetime import datetime, timedelta
+from fetchPool import yf_limiter
+from runtime import DATA_DIR, lazy_import
+
+yf = lazy_import("yfinance")  # ✅ Only imported when bars are actually downloaded
+
+# 🔹 Local OHLCV store (SQLite keyed by ticker + date)
+PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", os.path.join(DATA_DIR, "prices.sqlite"))
+
+# 🔹 Number of symbols per multi-ticker yf.download request
+DOWNLOAD_CHUNK_SIZE = 100
+
+# 🔹 Calendar days covered by the yfinance period strings used in this repo
+PERIOD_DAYS = {"1d": 1, "5d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366}
+
+# 🔹 Full fetches start on the first trading day of the window, so allow a few days of slack
+WINDOW_SLACK_DAYS = 7
+
+# 🔹 Re-adjusted history (splits/dividends) shows up as a changed close on an already final bar
+ADJUSTMENT_TOLERANCE = 0.005
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+_connection = None
+
+
+def get_connection():
+    """Open (once) the SQLite price store and make sure the schema exists."""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(PRICE_STORE_PATH) or ".", exist_ok=True)
+        _connection = sqlite3.connect(PRICE_STORE_PATH)
+        _connection.execute(
+            """CREATE TABLE IF NOT EXISTS prices (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (ticker, date)
+            )"""
+        )
+        # Earliest date a full fetch asked for: everything yfinance had since then is stored, so a
+        # ticker listed inside the window isn't re-downloaded in full every run
+        _connection.execute(
+            """CREATE TABLE IF NOT EXISTS history_coverage (
+                ticker TEXT PRIMARY KEY,
+                requested_from TEXT NOT NULL
+            )"""
+        )
+        _connection.commit()
+    return _connection
+
+
+# 🔹 Function to fetch OHLCV history for many tickers in a few batched requests
+def fetch_price_history(tickers, period="3mo", start=None, chunk_size=DOWNLOAD_CHUNK_SIZE, max_retries=3):
+    """Download history in chunked yf.download calls, returning {ticker: DataFrame}."""
+    histories = {}
+    unique_tickers = list(dict.fromkeys(t for t in tickers if t))
+    window = {"start": start} if start else {"period": period}
+
+    for offset in range(0, len(unique_tickers), chunk_size):
+        chunk = unique_tickers[offset:offset + chunk_size]
+        frame = None
+        retries = 0
+        while retries < max_retries:
+            try:
+                yf_limiter.acquire()  # ✅ One token per download request
+                frame = yf.download(chunk, group_by="ticker", auto_adjust=True,
+                                    threads=True, progress=False, **window)
+                break
+            except Exception as e:
+                if "Too Many Requests" in str(e):
+                    print(f"⚠️ YFinance Rate Limit hit for batch of {len(chunk)} tickers. Pausing for 20 seconds...")
+                    yf_limiter.backoff(20)
+                    retries += 1
+                else:
+                    print(f"❌ Error downloading batch starting at {chunk[0]}: {e}")
+                    break
+
+        if frame is None or frame.empty:
+            continue
+
+        # Slice the combined frame back into one OHLCV frame per ticker
+        for ticker in chunk:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if ticker not in frame.columns.get_level_values(0):
+                    continue
+                hist = frame[ticker]
+            else:
+                hist = frame
+            hist = hist.dropna(how="all")
+            if not hist.empty:
+                histories[ticker] = hist
+
+        print(f"📦 Downloaded history for {len(chunk)} tickers ({offset + len(chunk)}/{len(unique_tickers)})")
+
+    return histories
+
+
+def _stored_bounds(conn, ticker):
+    """Return (first_date, last_date, second_last_date) stored for a ticker."""
+    first_date, last_date = conn.execute(
+        "SELECT MIN(date), MAX(date) FROM prices WHERE ticker = ?", (ticker,)
+    ).fetchone()
+    row = conn.execute(
+        "SELECT date FROM prices WHERE ticker = ? ORDER BY date DESC LIMIT 1 OFFSET 1", (ticker,)
+    ).fetchone()
+    return first_date, last_date, row[0] if row else None
+
+
+def _full_history_held(conn, ticker, window_start):
+    """True when an earlier full fetch already asked for bars from `window_start` or before."""
+    row = conn.execute("SELECT requested_from FROM history_coverage WHERE ticker = ?", (ticker,)).fetchone()
+    return row is not None and row[0] <= window_start
+
+
+def _mark_full_history(conn, ticker, requested_from):
+    conn.execute("INSERT OR REPLACE INTO history_coverage VALUES (?, ?)", (ticker, requested_from))
+
+
+def _stored_close(conn, ticker, date):
+    row = conn.execute("SELECT close FROM prices WHERE ticker = ? AND date = ?", (ticker, date)).fetchone()
+    return row[0] if row else None
+
+
+def _save_history(conn, ticker, hist, replace=False):
+    """Upsert OHLCV rows for one ticker (optionally wiping what was stored before)."""
+    if replace:
+        conn.execute("DELETE FROM prices WHERE ticker = ?", (ticker,))
+    rows = [
+        (ticker, index.strftime("%Y-%m-%d"),
+         *[None if pd.isna(bar.get(col)) else float(bar.get(col)) for col in OHLCV_COLUMNS])
+        for index, bar in hist.iterrows()
+    ]
+    conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def _read_history(conn, ticker, since):
+    frame = pd.read_sql_query(
+        "SELECT date, open, high, low, close, volume FROM prices WHERE ticker = ? AND date >= ? ORDER BY date",
+        conn, params=(ticker, since), parse_dates=["date"],
+    )
+    frame.columns = ["Date"] + OHLCV_COLUMNS
+    return frame.set_index("Date")
+
+
+def _is_readjusted(conn, ticker, hist, date):
+    """True when yfinance re-adjusted a bar we already stored (split/dividend)."""
+    stored = _stored_close(conn, ticker, date)
+    fresh = hist["Close"][hist.index.strftime("%Y-%m-%d") == date]
+    if stored is None or fresh.empty or not stored:
+        return False
+    return abs(float(fresh.iloc[0]) - stored) / stored > ADJUSTMENT_TOLERANCE
+
+
+# 🔹 Function every history consumer reads through
+def load_history(tickers, period="3mo"):
+    """Return {ticker: DataFrame} for the period, fetching only bars missing from the local store."""
+    conn = get_connection()
+    today = datetime.now().date()
+    window_start = (today - timedelta(days=PERIOD_DAYS.get(period, 92))).strftime("%Y-%m-%d")
+    window_cutoff = (today - timedelta(days=PERIOD_DAYS.get(period, 92) - WINDOW_SLACK_DAYS)).strftime("%Y-%m-%d")
+    unique_tickers = list(dict.fromkeys(t for t in tickers if t))
+
+    full_fetch = []
+    incremental = {}  # {fetch_start_date: [tickers]}
+    for ticker in unique_tickers:
+        first_date, last_date, second_last_date = _stored_bounds(conn, ticker)
+        if (last_date is None or second_last_date is None
+                or (first_date > window_cutoff and not _full_history_held(conn, ticker, window_start))):
+            full_fetch.append(ticker)
+        else:
+            # Re-fetch from the last final bar so today's partial bar is refreshed too
+            incremental.setdefault(second_last_date, []).append(ticker)
+
+    if full_fetch:
+        print(f"📥 Price store: full {period} fetch for {len(full_fetch)} tickers")
+        for ticker, hist in fetch_price_history(full_fetch, period=period).items():
+            _save_history(conn, ticker, hist, replace=True)
+            _mark_full_history(conn, ticker, window_start)
+        conn.commit()
+
+    for fetch_start, group in incremental.items():
+        print(f"📥 Price store: appending bars since {fetch_start} for {len(group)} tickers")
+        refetch = []
+        for ticker, hist in fetch_price_history(group, start=fetch_start).items():
+            if _is_readjusted(conn, ticker, hist, fetch_start):
+                refetch.append(ticker)
+                continue
+            _save_history(conn, ticker, hist)
+        if refetch:
+            print(f"🔄 Price store: history re-adjusted for {len(refetch)} tickers, fetching full {period}")
+            for ticker, hist in fetch_price_history(refetch, period=period).items():
+                _save_history(conn, ticker, hist, replace=True)
+                _mark_full_history(conn, ticker, window_start)
+        conn.commit()
+
+    histories = {}
+    for ticker in unique_tickers:
+        hist = _read_history(conn, ticker, window_start)
+        if not hist.empty:
+            histories[ticker] = hist
+    return histories
@@ -0,0 +1,65 @@
+import os  # Required for environment variables
+import math
+import threading
+import importlib
+
+# 🔹 Shared runtime for the stage scripts
+# Settings and helpers every script used to repeat, plus deferred imports: yfinance and openai
+# each take ~0.4s to import, so they are only loaded by the code path that actually calls them.
+
+# 🔹 Local state (price store, caches, batch files) lives under one directory
+DATA_DIR = os.getenv("STOCK_DATA_DIR", "data")
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    """`yf = lazy_import("yfinance")` reads like `import yfinance as yf` but costs nothing until used."""
+    return LazyModule(name)
+
+
+openai = lazy_import("openai")
+
+_openai_client = None
+_openai_lock = threading.Lock()
+
+
+def get_openai_client(api_key=None):
+    """Process-wide OpenAI client, created on first use (OPENAI_API_KEY unless a key is given)."""
+    global _openai_client
+    with _openai_lock:
+        if _openai_client is None:
+            _openai_client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        return _openai_client
+
+
+# 🔹 Function to safely convert values
+def safe_convert(value):
+    """Convert values to JSON-compliant types and handle invalid floats."""
+    if hasattr(value, "iloc"):  # pandas Series / DataFrame
+        return value.iloc[0] if not value.empty else "N/A"
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):  # numpy scalar
+        value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):  # Handle NaN, Infinity, and -Infinity
+            return "N/A"
+    return value
+
+
+def clean_float(value, default=0.0):
+    """Sheet text ("12.5%", "$1,234", "N/A") -> float, or `default` for invalid numbers."""
+    try:
+        return float(str(value).replace("%", "").replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return default
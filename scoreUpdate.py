@@ -1,44 +1,17 @@
-import os  # Required for environment variables
-import json  # Required for JSON parsing
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
-import time
+import numpy as np
 from datetime import datetime, timedelta
+from sheetsGateway import get_gateway
+from sheetSnapshot import read_snapshot, patch_block
+from deltaWriter import write_delta
+from sheetFormatting import SCORE_BANDS, AVOID_BAND, ensure_score_formatting
 
-# 🔹 Google Sheets API Setup with Two Keys
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-# 🔹 Load credentials from GitHub Secrets
-CREDS_JSON_1 = os.getenv("GOOGLE_CREDENTIALS_1")
-CREDS_JSON_2 = os.getenv("GOOGLE_CREDENTIALS_2")
-
-# Function to authorize with a given key
-def authorize_client(creds_json):
-    creds_dict = json.loads(creds_json)
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
-    return gspread.authorize(creds)
-
-# Start with API Key 1
-client = authorize_client(CREDS_JSON_1)
-active_api = 1  # Track which API key is being used
-
-# Open the spreadsheet and access both Large Cap & Mid Cap sheets
-sheet = client.open("Stock Investment Analysis")
-sheets_to_update = {
-    "SP Tracker":sheet.worksheet("SP Tracker"),
-    "Large Cap": sheet.worksheet("Large Cap"),
-    "Mid Cap": sheet.worksheet("Mid Cap"),
-    "Technology":sheet.worksheet("Technology"),
-    
-}
+# 🔹 Google Sheets access goes through the shared quota-aware gateway (GOOGLE_CREDENTIALS_1 .. N)
+gateway = get_gateway()
 
-# 🔹 Function to switch API keys when hitting rate limits
-def switch_api_key():
-    global active_api, client
-    active_api = 2 if active_api == 1 else 1  # Toggle API key
-    client = authorize_client(CREDS_JSON_2 if active_api == 2 else CREDS_JSON_1)
-    print(f"🔄 Switched to API Key {active_api}")
+# Sheets scored by this script
+SHEET_NAMES = ["SP Tracker", "Large Cap", "Mid Cap", "Technology"]
 
 # Weight assignments for scoring
 WEIGHTS = {
@@ -52,125 +25,120 @@ WEIGHTS = {
     "VWMA vs Current Price": 0.05,
 }
 
-# News Recency Score Adjustments
+# News Recency Score Adjustments (vectorized over whole columns)
 def news_score_adjustment(news_age, sentiment_ratio):
-    if news_age <= 3:
-        return 1.0 if sentiment_ratio >= 0.75 else 0.75 if sentiment_ratio >= 0.5 else 0.5
-    elif 4 <= news_age <= 7:
-        return 0.5 if sentiment_ratio >= 0.75 else 0.25 if sentiment_ratio >= 0.5 else 0
-    elif 8 <= news_age <= 14:
-        return 0.1
-    elif news_age > 14:
-        return -0.5 if sentiment_ratio >= 0.75 else -0.75 if sentiment_ratio >= 0.5 else -1.0
-    return 0
+    def by_sentiment(strong, positive, other):
+        return np.select([sentiment_ratio >= 0.75, sentiment_ratio >= 0.5], [strong, positive], other)
+
+    return np.select(
+        [news_age <= 3, (news_age >= 4) & (news_age <= 7), (news_age >= 8) & (news_age <= 14), news_age > 14],
+        [by_sentiment(1.0, 0.75, 0.5), by_sentiment(0.5, 0.25, 0), 0.1, by_sentiment(-0.5, -0.75, -1.0)],
+        0,
+    )
 
 # Scoring function
-def calculate_score(row):
-    score = (
-        row["1 Month Price Change"] * WEIGHTS["1 Month Price Change"] +
-        row["1 Week Price Change"] * WEIGHTS["1 Week Price Change"] +
-        row["1 Day Price Change"] * WEIGHTS["1 Day Price Change"] +
-        row["Volume"] * WEIGHTS["Volume"] +
-        row["RSI"] * WEIGHTS["RSI"] if 30 <= row["RSI"] <= 70 else 0 +
-        row["Sentiment Ratio"] * WEIGHTS["Sentiment Ratio"] +
-        row["ATR"] * WEIGHTS["ATR"] +
-        (WEIGHTS["VWMA vs Current Price"] if row["VWMA vs Current Price"] > 0 else 0) +
-        news_score_adjustment(row["News Age"], row["Sentiment Ratio"])
+# ⚠️ The RSI band picks between the two halves of the sum: inside 30-70 the score is the
+# price/volume/RSI terms, outside it the sentiment/ATR/VWMA/news terms.
+def calculate_score(df):
+    momentum = (
+        df["1 Month Price Change"] * WEIGHTS["1 Month Price Change"] +
+        df["1 Week Price Change"] * WEIGHTS["1 Week Price Change"] +
+        df["1 Day Price Change"] * WEIGHTS["1 Day Price Change"] +
+        df["Volume"] * WEIGHTS["Volume"] +
+        df["RSI"] * WEIGHTS["RSI"]
+    )
+    sentiment = (
+        df["Sentiment Ratio"] * WEIGHTS["Sentiment Ratio"] +
+        df["ATR"] * WEIGHTS["ATR"] +
+        np.where(df["VWMA vs Current Price"] > 0, WEIGHTS["VWMA vs Current Price"], 0) +
+        news_score_adjustment(df["News Age"], df["Sentiment Ratio"])
     )
-    return round(score, 2)
-
-# Categorization function
-def categorize_score(score):
-    if score >= 6.8:
-        return "🚀 Strong Buy", (0, 128, 0)
-    elif 5.5 <= score < 6.8:
-        return "✅ Buy", (144, 238, 144)
-    elif 4.0 <= score < 5.5:
-        return "🤔 Neutral", None
-    elif 3.0 <= score < 4.0:
-        return "⚠️ Caution / Weak", (255, 255, 0)
-    else:
-        return "❌ Avoid / Sell", (255, 102, 102)
-
-# 🔹 Process in batches of 10 rows for both Large Cap & Mid Cap sheets
-for sheet_name, worksheet in sheets_to_update.items():
-    print(f"\n🔄 Processing {sheet_name}...")
-
-    # Fetch data into a DataFrame
-    data = worksheet.get_all_records()
-    df = pd.DataFrame(data)
-
-    # Convert columns to numeric (handling errors)
-    numeric_cols = [
-        "1 Day Price Change", "1 Week Price Change", "1 Month Price Change",
-        "Volume", "RSI", "VWMA", "Current Price", "EMA", "ATR", "Sentiment Ratio"
-    ]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-
-    # Convert "Latest News Date" to datetime format
-    df["Latest News Date"] = pd.to_datetime(df["Latest News Date"], errors='coerce')
-
-    # Compute News Age (Days)
-    today = datetime.today()
-    df["News Age"] = (today - df["Latest News Date"]).dt.days.fillna(999)
-
-    # Add VWMA vs Current Price column
-    df["VWMA vs Current Price"] = df["Current Price"] - df["VWMA"]
-
-    # Normalize values before scoring
-    df["1 Day Price Change"] *= 100
-    df["1 Week Price Change"] *= 100
-    df["1 Month Price Change"] *= 100
-    df["Volume"] /= 1e6
-    df["ATR"] = 1 / (df["ATR"] + 1)
-
-    # Process in **batches of 10 rows at a time**
-    batch_size = 10
-    for i in range(0, len(df), batch_size):
-        batch = df.iloc[i:i + batch_size]
-
-        batch_updates = []
-        batch_formatting = []
-        row_numbers = []
-
-        for idx, row in batch.iterrows():
-            stock_score = calculate_score(row)
-            category, color = categorize_score(stock_score)
-            row_number = idx + 2  # Adjust for Google Sheets
-
-            print(f"Batch updating {sheet_name} row {row_number} - {row['Symbol']} | Score: {stock_score} | Category: {category} | News Age: {row['News Age']} days")
-
-            batch_updates.append([[stock_score]])
-            row_numbers.append(row_number)
-
-            if color:
-                batch_formatting.append((row_number, color))
-
-        retry = True
-        while retry:
-            try:
-                if batch_updates:
-                    cell_ranges = [f"AE{row}" for row in row_numbers]
-                    worksheet.batch_update([{"range": r, "values": v} for r, v in zip(cell_ranges, batch_updates)])
-
-                for row_number, color in batch_formatting:
-                    worksheet.format(f"A{row_number}", {"backgroundColor": {"red": color[0] / 255, "green": color[1] / 255, "blue": color[2] / 255}})
-
-                print(f"✅ Successfully batch updated {sheet_name} rows {row_numbers}")
-                retry = False  # Stop retry loop
-
-            except gspread.exceptions.APIError as e:
-                error_message = str(e)
-                if "429" in error_message:
-                    print(f"⚠️ Rate limit hit! Pausing for 60 seconds before switching API keys...")
-                    time.sleep(10)  # Wait for 60 seconds
-                    switch_api_key()  # Switch API Key
-                    worksheet = client.open("Stock Investment Analysis").worksheet(sheet_name)
-                else:
-                    print(f"❌ Error batch updating {sheet_name} rows {row_numbers}: {e}")
-                    retry = False
-
-        time.sleep(1)  # Small delay to prevent hitting API limits
-
-print("✅ Scores updated in batches of 10 & Colors applied to Column A for both Large Cap & Mid Cap!")
+    score = np.where(df["RSI"].between(30, 70), momentum, sentiment)
+    return pd.Series(score, index=df.index).round(2)
+
+# Categorization function (bands and their Column A colours live in sheetFormatting.SCORE_BANDS)
+def categorize_score(scores):
+    band = np.select([scores >= lower for lower, _, _ in SCORE_BANDS], range(len(SCORE_BANDS)), len(SCORE_BANDS))
+    labels = [name for _, name, _ in SCORE_BANDS] + [AVOID_BAND[0]]
+    return pd.Series([labels[i] for i in band], index=scores.index)
+
+# Columns used for scoring
+numeric_cols = [
+    "1 Day Price Change", "1 Week Price Change", "1 Month Price Change",
+    "Volume", "RSI", "VWMA", "Current Price", "EMA", "ATR", "Sentiment Ratio"
+]
+
+# 🔹 Stage entry point (also called by pipeline.py)
+def run():
+    """Score every tracked ticker and write column AE of each sheet."""
+    # 🔹 Read only the scoring columns of every sheet in one request
+    snapshot = read_snapshot({name: ["Symbol", *numeric_cols, "Latest News Date"] for name in SHEET_NAMES})
+
+    # 🔹 Normalize each sheet's columns
+    frames = {}
+    for sheet_name in SHEET_NAMES:
+        print(f"\n🔄 Reading {sheet_name}...")
+        df = snapshot[sheet_name]
+
+        # Convert columns to numeric (handling errors)
+        for col in numeric_cols:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+
+        # Convert "Latest News Date" to datetime format
+        df["Latest News Date"] = pd.to_datetime(df["Latest News Date"], errors='coerce')
+
+        # Compute News Age (Days)
+        today = datetime.today()
+        df["News Age"] = (today - df["Latest News Date"]).dt.days.fillna(999)
+
+        # Add VWMA vs Current Price column
+        df["VWMA vs Current Price"] = df["Current Price"] - df["VWMA"]
+
+        # Normalize values before scoring
+        df["1 Day Price Change"] *= 100
+        df["1 Week Price Change"] *= 100
+        df["1 Month Price Change"] *= 100
+        df["Volume"] /= 1e6
+        df["ATR"] = 1 / (df["ATR"] + 1)
+
+        frames[sheet_name] = df
+
+    # 🔹 Score each unique ticker once (first listing wins), then fan the score out to every sheet row
+    combined = pd.concat(frames.values(), ignore_index=True).drop_duplicates(subset="Symbol", keep="first")
+    scores = pd.Series(calculate_score(combined).values, index=combined["Symbol"])
+    print(f"🌐 Scored {len(scores)} unique tickers across {sum(len(df) for df in frames.values())} sheet rows")
+
+    # 🔹 Column A colours come from conditional-format rules on the AE score (installed once)
+    try:
+        ensure_score_formatting(SHEET_NAMES, gateway)
+    except gspread.exceptions.APIError as e:
+        print(f"❌ Error installing score formatting rules: {e}")
+
+    # 🔹 One AE update per sheet, only for the scores that changed
+    for sheet_name in SHEET_NAMES:
+        print(f"\n🔄 Processing {sheet_name}...")
+        df = frames[sheet_name]
+        if df.empty:
+            continue
+
+        sheet_scores = df["Symbol"].map(scores)
+        print(categorize_score(sheet_scores).value_counts().to_string())
+
+        last_row = len(df) + 1  # Row 1 is the header
+        score_rows = dict(enumerate([[score] for score in sheet_scores.tolist()], start=2))
+        row_keys = dict(enumerate(df["Symbol"].tolist(), start=2))  # ✅ Re-sorted rows are rewritten in full
+
+        try:
+            write_delta(sheet_name, [(score_rows, "AE")], gateway, row_keys=row_keys)
+            patch_block(sheet_name, score_rows, "AE")  # ✅ Later stages in this process see the new scores
+            print(f"✅ Successfully updated {sheet_name} scores for rows 2-{last_row}")
+
+        except gspread.exceptions.APIError as e:
+            print(f"❌ Error updating {sheet_name} scores: {e}")
+
+    print("✅ Scores updated for every sheet (Column A colours follow the score bands)!")
+    return scores
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,116 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import operator
+import pandas as pd
+
+# 🔹 Declarative stock screens
+# Screens live in screens.json. Every condition compares a column with a constant, a [low, high]
+# range, another column, or a per-sheet aggregate times a factor ("Volume > 1.2 × sheet mean").
+# Screens are compiled once into mask functions; the aggregates every screen needs are computed
+# once per sheet, and each screen is a single vectorized pass over the whole frame.
+
+SCREENS_PATH = os.getenv("SCREENS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "screens.json"))
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+AGGREGATES = {"mean", "median", "min", "max", "std", "sum"}
+
+
+def _compile_operand(value, screen_name):
+    """Return (fn(df, aggregates) -> scalar or Series, [(aggregate, column)] it needs)."""
+    if isinstance(value, (int, float)):
+        return (lambda df, aggregates: value), []
+
+    if isinstance(value, dict):
+        column = value["column"]
+        factor = value.get("factor", 1)
+        aggregate = value.get("aggregate")
+        if aggregate is None:
+            return (lambda df, aggregates: df[column] * factor), []
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Screen '{screen_name}': unknown aggregate '{aggregate}'")
+        key = (aggregate, column)
+        return (lambda df, aggregates: aggregates[key] * factor), [key]
+
+    raise ValueError(f"Screen '{screen_name}': unsupported value {value!r}")
+
+
+def _compile_condition(condition, screen_name):
+    """Return (fn(df, aggregates) -> boolean Series, [(aggregate, column)] it needs)."""
+    column, op = condition["column"], condition["op"]
+
+    if op == "between":
+        low, high = condition["value"]
+        return (lambda df, aggregates: df[column].between(low, high)), []
+
+    if op not in OPERATORS:
+        raise ValueError(f"Screen '{screen_name}': unknown operator '{op}'")
+    compare = OPERATORS[op]
+    operand, needed = _compile_operand(condition["value"], screen_name)
+    return (lambda df, aggregates: compare(df[column], operand(df, aggregates))), needed
+
+
+class Screen:
+    """One compiled screen: the sheets it runs on, where matches go, and its AND-ed conditions."""
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.label = config.get("label", "✅")
+        self.sheets = config["sheets"]
+        self.output = config["output"]
+        self.conditions, self.aggregates = [], []
+        for condition in config["all"]:
+            fn, needed = _compile_condition(condition, self.name)
+            self.conditions.append(fn)
+            self.aggregates.extend(needed)
+        self.columns = list(dict.fromkeys(
+            [condition["column"] for condition in config["all"]]
+            + [condition["value"]["column"] for condition in config["all"] if isinstance(condition["value"], dict)]
+        ))
+
+    def mask(self, df, aggregates):
+        selected = pd.Series(True, index=df.index)
+        for condition in self.conditions:
+            selected &= condition(df, aggregates)
+        return selected
+
+
+def load_screens(path=SCREENS_PATH):
+    """Read and compile every screen in the config file."""
+    with open(path, encoding="utf-8") as f:
+        return [Screen(config) for config in json.load(f)["screens"]]
+
+
+def screen_columns(screens):
+    """Every column the screens read (so callers can clean them as numbers)."""
+    return list(dict.fromkeys(column for screen in screens for column in screen.columns))
+
+
+def run_screens(screens, frames):
+    """Apply every screen to its sheets and return {output: DataFrame of matching rows}.
+
+    Matches are concatenated in screen order, then sheet order, then row order.
+    """
+    aggregates_by_sheet = {}
+    for screen in screens:
+        for sheet in screen.sheets:
+            aggregates_by_sheet.setdefault(sheet, set()).update(screen.aggregates)
+    aggregates_by_sheet = {
+        sheet: {(aggregate, column): frames[sheet][column].agg(aggregate) for aggregate, column in needed}
+        for sheet, needed in aggregates_by_sheet.items()
+    }
+
+    matches = {}
+    for screen in screens:
+        selected = [frames[sheet][screen.mask(frames[sheet], aggregates_by_sheet[sheet])] for sheet in screen.sheets]
+        symbols = [symbol for frame in selected for symbol in frame["Symbol"].tolist()]
+        print(f"{screen.label} {screen.name}: {len(symbols)} stocks {symbols}")
+        matches.setdefault(screen.output, []).extend(selected)
+
+    return {output: pd.concat(selected, ignore_index=True) for output, selected in matches.items()}
@@ -0,0 +1,134 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import hashlib
+from gspread.utils import a1_range_to_grid_range
+from runtime import DATA_DIR
+from sheetsGateway import get_gateway
+
+# 🔹 Server-side conditional formatting
+# Instead of colouring cells one request at a time, each formatted range gets a set of Google Sheets
+# conditional-format rules, installed once. Sheets re-evaluates them whenever the values change, so
+# formatting costs nothing per row. A fingerprint of the installed rules is kept on disk and the
+# rules are only re-sent when they change (one metadata read + one batchUpdate).
+
+FORMAT_STATE_PATH = os.getenv("FORMAT_STATE_PATH", os.path.join(DATA_DIR, "format_rules.json"))
+
+# 🔹 Score bands (lower bound, category, Column A colour); anything below the last band is "Avoid / Sell"
+SCORE_BANDS = [
+    (6.8, "🚀 Strong Buy", (0, 128, 0)),
+    (5.5, "✅ Buy", (144, 238, 144)),
+    (4.0, "🤔 Neutral", None),
+    (3.0, "⚠️ Caution / Weak", (255, 255, 0)),
+]
+AVOID_BAND = ("❌ Avoid / Sell", (255, 102, 102))
+SCORE_COLUMN = "AE"
+
+# 🔹 AI decision colours for Top Picks column C (first match wins, like the old if/elif chain)
+DECISION_COLORS = [
+    ("BUY", (0.8, 1.0, 0.8)),  # Light Green
+    ("SELL", (1.0, 0.8, 0.8)),  # Light Red
+    ("HOLD", (1.0, 1.0, 0.8)),  # Light Yellow
+]
+
+
+def _rgb255(color):
+    return {"red": color[0] / 255, "green": color[1] / 255, "blue": color[2] / 255}
+
+
+def _rgb(color):
+    return {"red": color[0], "green": color[1], "blue": color[2]}
+
+
+def score_band_rules():
+    """Custom-formula rules colouring column A from the score in column AE."""
+    rules = []
+    upper = None
+    for lower, _, color in SCORE_BANDS + [(None, *AVOID_BAND)]:
+        terms = [f"ISNUMBER(${SCORE_COLUMN}2)"]
+        if lower is not None:
+            terms.append(f"${SCORE_COLUMN}2>={lower}")
+        if upper is not None:
+            terms.append(f"${SCORE_COLUMN}2<{upper}")
+        if color:
+            rules.append({
+                "condition": {"type": "CUSTOM_FORMULA", "values": [{"userEnteredValue": f"=AND({','.join(terms)})"}]},
+                "format": {"backgroundColor": _rgb255(color)},
+            })
+        upper = lower
+    return rules
+
+
+def decision_rules():
+    """Text rules colouring the AI decision cell (Sheets' "text contains" is case-insensitive)."""
+    return [
+        {
+            "condition": {"type": "TEXT_CONTAINS", "values": [{"userEnteredValue": keyword}]},
+            "format": {"backgroundColor": _rgb(color)},
+        }
+        for keyword, color in DECISION_COLORS
+    ]
+
+
+def _load_state():
+    try:
+        with open(FORMAT_STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(os.path.dirname(FORMAT_STATE_PATH) or ".", exist_ok=True)
+    with open(FORMAT_STATE_PATH, "w") as f:
+        json.dump(state, f)
+
+
+def _same_range(a, b):
+    """Compare GridRanges the way the API returns them (zero-valued fields are omitted)."""
+    return all(a.get(key, 0) == b.get(key, 0) for key in ("sheetId", "startRowIndex", "startColumnIndex")) and \
+        all(a.get(key) == b.get(key) for key in ("endRowIndex", "endColumnIndex"))
+
+
+def install_rules(sheet_name, a1_range, rules, gateway=None, force=False):
+    """Make `rules` the only conditional-format rules on `a1_range` (skipped when already installed)."""
+    gateway = gateway or get_gateway()
+    fingerprint = hashlib.sha256(json.dumps([a1_range, rules], sort_keys=True).encode()).hexdigest()
+    state = _load_state()
+    if not force and state.get(sheet_name, {}).get(a1_range) == fingerprint:
+        return False
+
+    metadata = gateway.read(None, lambda ss: ss.fetch_sheet_metadata())
+    sheet = next(sheet for sheet in metadata["sheets"] if sheet["properties"]["title"] == sheet_name)
+    sheet_id = sheet["properties"].get("sheetId", 0)
+    existing = sheet.get("conditionalFormats", [])
+    grid = dict(a1_range_to_grid_range(a1_range), sheetId=sheet_id)
+
+    # Replace only the rules previously installed on this range, newest index first
+    requests = [
+        {"deleteConditionalFormatRule": {"sheetId": sheet_id, "index": index}}
+        for index in reversed(range(len(existing)))
+        if any(_same_range(grid, rng) for rng in existing[index].get("ranges", []))
+    ]
+    requests += [
+        {"addConditionalFormatRule": {"rule": {"ranges": [grid], "booleanRule": rule}, "index": index}}
+        for index, rule in enumerate(rules)
+    ]
+    # Clear static backgrounds left behind by the old per-cell formatting
+    requests.append({"repeatCell": {"range": grid, "cell": {}, "fields": "userEnteredFormat.backgroundColor"}})
+
+    gateway.write(None, lambda ss: ss.batch_update({"requests": requests}))
+    state.setdefault(sheet_name, {})[a1_range] = fingerprint
+    _save_state(state)
+    print(f"🎨 Installed {len(rules)} conditional-format rules on {sheet_name}!{a1_range}")
+    return True
+
+
+def ensure_score_formatting(sheet_names, gateway=None, force=False):
+    """Column A of every scored sheet follows the score band in column AE."""
+    for sheet_name in sheet_names:
+        install_rules(sheet_name, "A2:A", score_band_rules(), gateway, force)
+
+
+def ensure_decision_formatting(sheet_name="Top Picks", gateway=None, force=False):
+    """Top Picks column C is coloured by the BUY / SELL / HOLD decision."""
+    install_rules(sheet_name, "C2:C", decision_rules(), gateway, force)
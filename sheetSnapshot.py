@@ -0,0 +1,201 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import pandas as pd
+from gspread.utils import rowcol_to_a1, a1_to_rowcol
+from runtime import DATA_DIR
+from sheetsGateway import get_gateway
+
+# 🔹 Single-request workbook snapshot
+# Each stage names the tabs (and optionally the columns) it needs. Everything missing from the
+# in-process snapshot is fetched in one values_batch_get call and returned as DataFrames.
+# Column letters are resolved from a header cache on disk and verified against the first cell
+# of every column read, so a moved column only costs one extra header request.
+# Stages that publish to a tab also patch the snapshot (patch_block / publish_frame), so a later
+# stage in the same process (see pipeline.py) reads what was just written without a request.
+
+HEADER_CACHE_PATH = os.getenv("SHEET_HEADER_CACHE_PATH", os.path.join(DATA_DIR, "sheet_headers.json"))
+
+_snapshot = {}  # {tab: DataFrame}
+_full_tabs = set()  # Tabs read with every column
+
+
+def _load_header_cache():
+    try:
+        with open(HEADER_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_header_cache(headers):
+    os.makedirs(os.path.dirname(HEADER_CACHE_PATH) or ".", exist_ok=True)
+    with open(HEADER_CACHE_PATH, "w") as f:
+        json.dump(headers, f)
+
+
+def _fetch_headers(tabs, gateway):
+    """Read row 1 of every tab in one request."""
+    response = gateway.read(None, lambda ss: ss.values_batch_get([f"'{tab}'!1:1" for tab in tabs]))
+    return {tab: (value_range.get("values") or [[]])[0]
+            for tab, value_range in zip(tabs, response.get("valueRanges", []))}
+
+
+def _column_letter(index):
+    """0-based column index -> A1 column letter."""
+    return rowcol_to_a1(1, index + 1)[:-1]
+
+
+def _pad(rows, width):
+    """Make every row exactly `width` cells (short rows padded, cells past the header dropped)."""
+    return [row[:width] + [""] * (width - len(row)) for row in rows]
+
+
+def clean_numeric(series):
+    """Parse sheet strings ("12.5%", "1,234", "N/A") to floats, NaN when not a number."""
+    cleaned = series.astype(str).str.replace("%", "", regex=False).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def _plan_ranges(tabs, headers, fresh=()):
+    """Return [(tab, column_name | None, a1_range)] and the tabs whose cached headers can't be trusted.
+
+    A requested column missing from the cached headers (e.g. the tab was empty when they were cached)
+    makes the tab's headers stale unless they were just fetched (`fresh`).
+    """
+    plan, unknown = [], []
+    for tab, columns in tabs.items():
+        if columns is None:
+            plan.append((tab, None, f"'{tab}'"))
+        elif tab not in headers or (tab not in fresh and not set(columns) <= set(headers[tab])):
+            unknown.append(tab)
+        else:
+            for column in columns:
+                if column not in headers[tab]:
+                    print(f"⚠️ {tab}: column '{column}' not found, skipping")
+                    continue
+                letter = _column_letter(headers[tab].index(column))
+                plan.append((tab, column, f"'{tab}'!{letter}:{letter}"))
+    return plan, unknown
+
+
+def _read_tabs(tabs, gateway):
+    headers = _load_header_cache()
+    fresh = set()  # Tabs whose headers were fetched during this read
+    for attempt in range(2):
+        plan, unknown = _plan_ranges(tabs, headers, fresh)
+        if unknown:
+            headers.update(_fetch_headers(unknown, gateway))
+            _save_header_cache(headers)
+            fresh.update(unknown)
+            plan, _ = _plan_ranges(tabs, headers, fresh)
+
+        ranges = [a1 for _, _, a1 in plan]
+        if not ranges:
+            value_ranges = []
+            break
+        response = gateway.read(None, lambda ss: ss.values_batch_get(ranges))
+        value_ranges = [vr.get("values", []) for vr in response.get("valueRanges", [])]
+
+        # A header that moved means the cached column letters are stale
+        stale = {tab for (tab, column, _), values in zip(plan, value_ranges)
+                 if column is not None and (not values or not values[0] or values[0][0] != column)}
+        if not stale or attempt == 1:
+            break
+        print(f"🔄 Sheet headers changed for {sorted(stale)}, refreshing column map...")
+        headers.update(_fetch_headers(sorted(stale), gateway))
+        _save_header_cache(headers)
+        fresh.update(stale)
+
+    columns_by_tab = {}
+    for (tab, column, _), values in zip(plan, value_ranges):
+        if column is None:
+            width = len(values[0]) if values else 0
+            _snapshot[tab] = pd.DataFrame(_pad(values[1:], width), columns=values[0] if values else [])
+            _full_tabs.add(tab)
+        else:
+            columns_by_tab.setdefault(tab, {})[column] = [row[0] if row else "" for row in values[1:]]
+
+    for tab, columns in columns_by_tab.items():
+        length = max(len(values) for values in columns.values())
+        _snapshot[tab] = pd.DataFrame({name: values + [""] * (length - len(values)) for name, values in columns.items()})
+        _full_tabs.discard(tab)
+
+    for tab in tabs:
+        if tab not in columns_by_tab and tab not in _full_tabs:
+            _snapshot[tab] = pd.DataFrame()  # None of the requested columns exist (e.g. an empty tab)
+
+    print(f"📸 Snapshot: {len(tabs)} tabs, {len(plan)} ranges in one request")
+
+
+# 🔹 Function every stage uses to read the workbook
+def read_snapshot(tabs, numeric_columns=(), refresh=False, gateway=None):
+    """Return {tab: DataFrame} for {tab: [column names] or None (all columns)} from one batched read."""
+    gateway = gateway or get_gateway()
+    missing = {
+        tab: columns for tab, columns in tabs.items()
+        if refresh or tab not in _snapshot
+        or (columns is None and tab not in _full_tabs)
+        or (columns is not None and tab not in _full_tabs and not set(columns) <= set(_snapshot[tab].columns))
+    }
+    if missing:
+        _read_tabs(missing, gateway)
+
+    frames = {}
+    for tab, columns in tabs.items():
+        frame = _snapshot[tab]
+        if columns is not None:
+            frame = frame[[column for column in columns if column in frame.columns]]
+        frame = frame.copy()
+        for column in numeric_columns:
+            if column in frame.columns:
+                frame[column] = clean_numeric(frame[column])
+        frames[tab] = frame
+    return frames
+
+
+# 🔹 In-process handoff between stages
+def loaded_frames(tabs):
+    """Return {tab: DataFrame} when every tab is already in memory with all columns, else None."""
+    if not all(tab in _full_tabs for tab in tabs):
+        return None
+    return {tab: _snapshot[tab] for tab in tabs}
+
+
+def remember_column(tab, column, values):
+    """Add a column read outside the snapshot (e.g. the universe's Symbol read) to a partially loaded tab."""
+    if tab in _full_tabs:
+        return
+    columns = {name: list(series) for name, series in _snapshot.get(tab, pd.DataFrame()).items()}
+    columns[column] = [str(value) for value in values]
+    length = max(len(values) for values in columns.values())
+    _snapshot[tab] = pd.DataFrame({name: values + [""] * (length - len(values)) for name, values in columns.items()})
+
+
+def loaded_column(tab, column):
+    """Values of `column` in a tab read during this run ([] for an empty tab), or None if not read."""
+    frame = _snapshot.get(tab)
+    if frame is None or (len(frame.columns) and column not in frame.columns):
+        return None
+    return frame[column].tolist() if column in frame.columns else []
+
+
+def patch_block(tab, row_values, start_col):
+    """Mirror a block write ({row_number: [values]} from column `start_col`) into a loaded tab."""
+    if tab not in _full_tabs:
+        return
+    frame = _snapshot[tab]
+    start = a1_to_rowcol(f"{start_col}1")[1] - 1
+    for row_number, values in row_values.items():
+        position = row_number - 2  # Row 1 is the header
+        if not 0 <= position < len(frame):
+            continue
+        for offset, value in enumerate(values[:max(len(frame.columns) - start, 0)]):
+            frame.iat[position, start + offset] = "" if value is None else str(value)
+
+
+def publish_frame(tab, rows):
+    """Record a tab that was just rewritten from `rows` (header first) as its in-memory snapshot."""
+    width = len(rows[0]) if rows else 0
+    _snapshot[tab] = pd.DataFrame(_pad([[str(value) for value in row] for row in rows[1:]], width),
+                                  columns=rows[0] if rows else [])
+    _full_tabs.add(tab)
@@ -0,0 +1,291 @@
+import os  # Required for environment variables
+import json  # Required for JSON parsing
+import copy
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+import gspread
+from runtime import DATA_DIR, lazy_import
+from fetchPool import YF_MAX_IN_FLIGHT
+
+service_account = lazy_import("oauth2client.service_account")
+google_requests = lazy_import("google.auth.transport.requests")
+requests_adapters = lazy_import("requests.adapters")
+
+# 🔹 Google Sheets API Setup
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_NAME = "Stock Investment Analysis"
+
+# 🔹 Opening by ID skips the Drive search behind open-by-name; without SPREADSHEET_ID the ID found by the
+# first name lookup is remembered on disk and used from then on
+SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
+SPREADSHEET_IDS_PATH = os.getenv("SPREADSHEET_IDS_PATH", os.path.join(DATA_DIR, "spreadsheet_ids.json"))
+
+# 🔹 Per-credential Sheets quota (Google allows 60 reads + 60 writes per minute per service account)
+READ_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_READ_QUOTA", "55"))
+WRITE_QUOTA_PER_MINUTE = int(os.getenv("SHEETS_WRITE_QUOTA", "55"))
+QUOTA_WINDOW_SECONDS = 60
+
+# 🔹 Warm pool: every credential is authorized and bound to the spreadsheet up front, and access tokens
+# are refreshed in the background before they expire, so switching credentials on a 429 is free
+WARM_POOL = os.getenv("SHEETS_WARM_POOL", "1").lower() in ("1", "true", "yes")
+TOKEN_REFRESH_MARGIN_SECONDS = 600
+TOKEN_CHECK_SECONDS = 60
+HTTP_POOL_SIZE = YF_MAX_IN_FLIGHT  # Kept-alive connections per credential: one per concurrent worker
+
+
+# 🔹 Function to load every configured credential (GOOGLE_CREDENTIALS_1 .. GOOGLE_CREDENTIALS_N)
+def load_credentials_from_env(prefix="GOOGLE_CREDENTIALS_"):
+    """Return the credential sources in order, stopping at the first missing index."""
+    sources = []
+    while os.getenv(f"{prefix}{len(sources) + 1}"):
+        sources.append(os.getenv(f"{prefix}{len(sources) + 1}"))
+    return sources
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _keep_alive(client):
+    """Size the client's connection pool so concurrent requests reuse open connections."""
+    session = getattr(getattr(client, "http_client", None), "session", None)
+    if session is not None:
+        adapter = requests_adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+
+
+# 🔹 Function to authenticate with Google Sheets (JSON string from secrets or path to a key file)
+def authenticate(creds_source):
+    """Authorized client for one credential; each credential is authorized once per process."""
+    with _clients_lock:
+        if creds_source not in _clients:
+            if creds_source.lstrip().startswith("{"):
+                creds = service_account.ServiceAccountCredentials.from_json_keyfile_dict(json.loads(creds_source), SCOPE)
+            else:
+                creds = service_account.ServiceAccountCredentials.from_json_keyfile_name(creds_source, SCOPE)
+            _clients[creds_source] = gspread.authorize(creds)
+            _keep_alive(_clients[creds_source])
+        return _clients[creds_source]
+
+
+def refresh_token(client, margin=TOKEN_REFRESH_MARGIN_SECONDS):
+    """Refresh the client's access token if it expires within `margin` seconds; True when refreshed."""
+    http_client = getattr(client, "http_client", None)
+    auth = getattr(http_client, "auth", None)
+    if auth is None:
+        return False
+    expiry = auth.expiry
+    if auth.token and expiry is not None:
+        remaining = expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)
+        if remaining.total_seconds() > margin:
+            return False
+    # ✅ Plain transport: the client's own session is auth-wrapped and would send the expiring token along
+    auth.refresh(google_requests.Request())
+    return True
+
+
+def _load_spreadsheet_ids():
+    try:
+        with open(SPREADSHEET_IDS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_spreadsheet_id(name, spreadsheet_id):
+    ids = _load_spreadsheet_ids()
+    ids[name] = spreadsheet_id
+    os.makedirs(os.path.dirname(SPREADSHEET_IDS_PATH) or ".", exist_ok=True)
+    with open(SPREADSHEET_IDS_PATH, "w") as f:
+        json.dump(ids, f)
+
+
+class CredentialSlot:
+    """One service account: its client, opened handles and the requests it sent in the last minute."""
+
+    def __init__(self, number, creds_source):
+        self.number = number
+        self.creds_source = creds_source
+        self.client = None
+        self.spreadsheet = None
+        self.worksheets = {}
+        self.requests = {"read": deque(), "write": deque()}
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+
+class SheetsGateway:
+    """Routes every Sheets request to the credential with the most quota headroom."""
+
+    def __init__(self, creds_sources, spreadsheet_name=SPREADSHEET_NAME, spreadsheet_id=SPREADSHEET_ID,
+                 read_quota=READ_QUOTA_PER_MINUTE, write_quota=WRITE_QUOTA_PER_MINUTE):
+        if not creds_sources:
+            raise ValueError("No Google credentials configured (set GOOGLE_CREDENTIALS_1 .. N)")
+        self.slots = [CredentialSlot(number, source) for number, source in enumerate(creds_sources, start=1)]
+        self.spreadsheet_name = spreadsheet_name
+        self.spreadsheet_id = spreadsheet_id or _load_spreadsheet_ids().get(spreadsheet_name)
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.lock = threading.Lock()
+        self.request_counts = {"read": 0, "write": 0}
+        self.warm_pool = WARM_POOL
+        self.warmed = False
+        self.warm_lock = threading.Lock()
+        self.bound = None  # (spreadsheet, {title: worksheet properties}) resolved by the first credential
+        self.refresher = None
+        self.stop_refresh = threading.Event()
+
+    # 🔹 Sliding-window bookkeeping
+    def _prune(self, slot, kind, now):
+        window = slot.requests[kind]
+        while window and now - window[0] >= QUOTA_WINDOW_SECONDS:
+            window.popleft()
+
+    def _headroom(self, slot, kind, now):
+        if now < slot.blocked_until:
+            return 0
+        self._prune(slot, kind, now)
+        return self.quotas[kind] - len(slot.requests[kind])
+
+    def _count(self, slot, kind):
+        """Count one request against the slot's quota window (caller holds self.lock)."""
+        slot.requests[kind].append(time.monotonic())
+        self.request_counts[kind] += 1
+
+    def _record(self, slot, kind):
+        with self.lock:
+            self._count(slot, kind)
+
+    def _reserve(self, kind):
+        """Pick the credential with the most headroom, waiting for the window to free up if all are full."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                slot = max(self.slots, key=lambda s: self._headroom(s, kind, now))
+                if self._headroom(slot, kind, now) > 0:
+                    self._count(slot, kind)
+                    return slot
+                wait = min(
+                    max(s.blocked_until - now, 0) if now < s.blocked_until
+                    else QUOTA_WINDOW_SECONDS - (now - s.requests[kind][0])
+                    for s in self.slots
+                )
+            print(f"⏳ Sheets {kind} quota full on all {len(self.slots)} credentials, pacing for {wait:.1f}s...")
+            time.sleep(max(wait, 0.1))
+
+    # 🔹 Lazily authorized handles per credential
+    def _open_spreadsheet(self, slot):
+        self._record(slot, "read")
+        if self.spreadsheet_id:
+            try:
+                return slot.client.open_by_key(self.spreadsheet_id)
+            except gspread.exceptions.SpreadsheetNotFound:
+                print(f"⚠️ Spreadsheet ID {self.spreadsheet_id} not found, looking up '{self.spreadsheet_name}' by name...")
+        spreadsheet = slot.client.open(self.spreadsheet_name)  # Drive search, only until the ID is known
+        self.spreadsheet_id = spreadsheet.id
+        _save_spreadsheet_id(self.spreadsheet_name, spreadsheet.id)
+        return spreadsheet
+
+    def _resolve(self, slot):
+        """Open the spreadsheet and every tab for one credential (two reads, done once per gateway)."""
+        slot.spreadsheet = self._open_spreadsheet(slot)
+        self._record(slot, "read")
+        slot.worksheets = {ws.title: ws for ws in slot.spreadsheet.worksheets()}
+        if hasattr(slot.client, "http_client"):
+            self.bound = (slot.spreadsheet, {title: ws._properties for title, ws in slot.worksheets.items()})
+
+    def _bind(self, slot):
+        """Re-bind the resolved handles to this credential's HTTP session (no network calls)."""
+        spreadsheet, properties = self.bound
+        http_client = slot.client.http_client
+        slot.spreadsheet = copy.copy(spreadsheet)
+        slot.spreadsheet.client = http_client
+        slot.worksheets = {
+            title: gspread.Worksheet(slot.spreadsheet, dict(props), spreadsheet.id, http_client)
+            for title, props in properties.items()
+        }
+
+    def _prepare(self, slot):
+        with slot.lock:
+            if slot.client is None:
+                slot.client = authenticate(slot.creds_source)
+            if slot.spreadsheet is None:
+                if self.bound is not None and hasattr(slot.client, "http_client"):
+                    self._bind(slot)
+                else:
+                    self._resolve(slot)
+
+    def warm(self):
+        """Authorize every credential, bind it to the spreadsheet and start the token refresher."""
+        with self.warm_lock:
+            if self.warmed:
+                return
+            for slot in self.slots:
+                try:
+                    self._prepare(slot)
+                    refresh_token(slot.client)
+                except Exception as e:  # ✅ A broken credential is retried lazily when it is picked
+                    print(f"⚠️ Could not warm API Key {slot.number}: {e}")
+            self.refresher = threading.Thread(target=self._refresh_loop, name="sheets-token-refresh", daemon=True)
+            self.refresher.start()
+            self.warmed = True
+            print(f"🔥 Sheets credential pool ready ({len(self.slots)} credentials)")
+
+    def _refresh_loop(self):
+        while not self.stop_refresh.wait(TOKEN_CHECK_SECONDS):
+            for slot in self.slots:
+                try:
+                    if slot.client is not None and refresh_token(slot.client):
+                        print(f"🔑 Refreshed access token for API Key {slot.number}")
+                except Exception as e:
+                    print(f"⚠️ Token refresh failed for API Key {slot.number}: {e}")
+
+    def close(self):
+        """Stop the background token refresher."""
+        self.stop_refresh.set()
+
+    def _open(self, slot, sheet_name):
+        if slot.spreadsheet is None:
+            self._prepare(slot)
+        if sheet_name is None:
+            return slot.spreadsheet
+        if sheet_name not in slot.worksheets:
+            # ✅ Tabs created after the handles were resolved
+            self._record(slot, "read")
+            slot.worksheets[sheet_name] = slot.spreadsheet.worksheet(sheet_name)
+        return slot.worksheets[sheet_name]
+
+    def run(self, kind, fn, sheet_name=None, max_retries=5):
+        """Call fn(worksheet) (or fn(spreadsheet) when sheet_name is None) through the quota scheduler."""
+        if self.warm_pool and not self.warmed:
+            self.warm()
+        last_error = None
+        for _ in range(max_retries):
+            slot = self._reserve(kind)
+            try:
+                return fn(self._open(slot, sheet_name))
+            except gspread.exceptions.APIError as e:
+                if "429" not in str(e):
+                    raise
+                last_error = e
+                slot.blocked_until = time.monotonic() + QUOTA_WINDOW_SECONDS
+                print(f"⚠️ Rate limit hit on API Key {slot.number}! Routing to another credential...")
+        raise last_error
+
+    def read(self, sheet_name, fn):
+        return self.run("read", fn, sheet_name)
+
+    def write(self, sheet_name, fn):
+        return self.run("write", fn, sheet_name)
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Process-wide gateway built from GOOGLE_CREDENTIALS_1 .. N."""
+    global _gateway
+    if _gateway is None:
+        _gateway = SheetsGateway(load_credentials_from_env())
+    return _gateway
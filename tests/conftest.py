@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# 🔹 The stages are flat scripts in the repo root; local state goes to a throwaway directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STOCK_DATA_DIR", tempfile.mkdtemp(prefix="stock-tests-"))
+os.environ.setdefault("SHEETS_WARM_POOL", "0")
@@ -0,0 +1,81 @@
+import pytest
+
+import aiCache
+from aiCache import _relative_bucket, _width_bucket, cache_key
+
+ROW = {
+    "Symbol": "AAPL", "Name": "Apple Inc.", "Industry": "Technology",
+    "Current Price": "$190.50", "Yesterday Close": "188.10", "Volume": "51,234,000", "Market Cap": "2.95T",
+    "1 Day Price Change": "1.2%", "1 Week Price Change": "2.5%", "1 Month Price Change": "6.1%",
+    "RSI": "58.3", "VWMA vs Current Price": "1.8%",
+    "News 1": "Apple unveils new iPhone", "News 2": "Apple beats earnings estimates", "News 3": "N/A",
+}
+
+
+@pytest.fixture
+def shared_across_tickers(monkeypatch):
+    monkeypatch.setattr(aiCache, "AI_CACHE_SHARE_ACROSS_TICKERS", True)
+
+
+def test_key_is_stable_and_ignores_field_order():
+    assert cache_key(ROW) == cache_key(dict(ROW))
+    assert cache_key(ROW) == cache_key(dict(reversed(list(ROW.items()))))
+
+
+def test_headline_order_case_and_spacing_do_not_change_the_key():
+    shuffled = dict(ROW, **{"News 1": ROW["News 2"], "News 2": "  apple UNVEILS new   iPhone "})
+    assert cache_key(shuffled) == cache_key(ROW)
+    assert cache_key(dict(ROW, **{"News 3": "Apple faces antitrust suit"})) != cache_key(ROW)
+
+
+def test_day_to_day_noise_does_not_change_the_key():
+    noisy = dict(ROW, **{"Volume": "72,000,000", "Market Cap": "3.01T", "Yesterday Close": "186.00",
+                         "1 Day Price Change": "-0.4%", "1 Week Price Change": "0.9%",
+                         "Current Price": "191.20", "RSI": "55.0", "1 Month Price Change": "4.0%"})
+    assert cache_key(noisy) == cache_key(ROW)
+
+
+def test_key_inputs_that_matter_change_the_key():
+    for field, value in [("Current Price", "215"), ("RSI", "71"), ("1 Month Price Change", "-6%"),
+                         ("VWMA vs Current Price", "-0.5%"), ("Industry", "Consumer Electronics")]:
+        assert cache_key(dict(ROW, **{field: value})) != cache_key(ROW), field
+
+
+def test_relative_bucket_keeps_magnitude_and_sign_apart():
+    assert _relative_bucket(100, 0.05) == _relative_bucket(100.1, 0.05)
+    assert _relative_bucket(100, 0.05) != _relative_bucket(106, 0.05)
+    assert _relative_bucket(0.49, 0.05) != _relative_bucket(2.08, 0.05)
+    assert _relative_bucket(-2, 0.05) != _relative_bucket(2, 0.05)
+    assert _relative_bucket(0, 0.05) == 0
+    assert _relative_bucket(None, 0.05) is None
+    assert _relative_bucket(float("nan"), 0.05) is None
+
+
+def test_width_bucket_boundaries():
+    assert _width_bucket(49.9, 10) == 4
+    assert _width_bucket(50.0, 10) == 5
+    assert _width_bucket(59.9, 10) == 5
+    assert _width_bucket(-0.1, 10) == -1
+    assert _width_bucket(None, 10) is None
+
+
+def test_identity_is_part_of_the_key_unless_shared():
+    other = dict(ROW, Symbol="MSFT", Name="Microsoft Corp.")
+    assert cache_key(other) != cache_key(ROW)
+
+
+def test_shared_keys_ignore_identity(shared_across_tickers):
+    other = dict(ROW, Symbol="MSFT", Name="Microsoft Corp.")
+    assert cache_key(other) == cache_key(ROW)
+
+
+def test_store_and_lookup_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(aiCache, "AI_CACHE_PATH", str(tmp_path / "ai_cache.sqlite"))
+    monkeypatch.setattr(aiCache, "_connection", None)
+    monkeypatch.setattr(aiCache, "_stats", {"hits": 0, "misses": 0})
+    key = cache_key(ROW)
+    assert aiCache.lookup_analysis(key) is None
+    aiCache.store_analysis(key, "AAPL", "Bullish above VWMA")
+    assert aiCache.lookup_analysis(key) == "Bullish above VWMA"
+    assert aiCache._stats == {"hits": 1, "misses": 1}
+    aiCache._connection.close()
@@ -0,0 +1,155 @@
+import json
+import random
+
+import pytest
+
+import deltaWriter
+import fakeSheets
+import sheetSnapshot
+from universe import load_universe
+
+TAB = "Large Cap"
+HEADER = ["Symbol", "Current Price", "Score", "Notes"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(deltaWriter, "PUBLISHED_STATE_PATH", str(tmp_path / "published_cells.json"))
+    new_process()
+    yield
+    new_process()
+
+
+def new_process():
+    """Forget everything a run keeps in memory (the state file on disk stays)."""
+    deltaWriter._state = None
+    deltaWriter._stamps = None
+    sheetSnapshot._snapshot.clear()
+    sheetSnapshot._full_tabs.clear()
+
+
+def blocks_for(tickers, values):
+    """Price/score block starting at column B for the tickers in sheet order."""
+    rows = {row: values[ticker] for row, ticker in enumerate(tickers, start=2)}
+    return [(rows, "B")], {row: ticker for row, ticker in enumerate(tickers, start=2)}
+
+
+def random_values(rng, tickers, previous=None):
+    values = {}
+    for ticker in tickers:
+        if previous and ticker in previous and rng.random() < 0.7:
+            values[ticker] = list(previous[ticker])  # Most cells don't change between runs
+        else:
+            values[ticker] = [rng.choice([None, round(rng.uniform(1, 500), 2)]), rng.choice(["", 4.5, 7, "N/A"])]
+    return values
+
+
+# 🔹 coalesce
+def test_coalesce_bridges_short_gaps_only():
+    target = {(2, col): f"v{col}" for col in range(1, 10)}
+    updates = deltaWriter.coalesce([(2, 1), (2, 4), (2, 8)], target)
+    assert [update["range"] for update in updates] == ["A2:D2", "H2:H2"]
+    assert updates[0]["values"] == [["v1", "v2", "v3", "v4"]]
+
+
+def test_coalesce_does_not_bridge_cells_outside_the_target():
+    target = {(2, 1): "a", (2, 3): "c"}
+    assert [update["range"] for update in deltaWriter.coalesce([(2, 1), (2, 3)], target)] == ["A2:A2", "C2:C2"]
+
+
+def test_coalesce_merges_equal_spans_on_consecutive_rows():
+    target = {(row, col): f"{row}.{col}" for row in range(2, 7) for col in range(1, 4)}
+    changed = [(2, 1), (2, 2), (3, 1), (3, 2), (5, 1), (5, 2), (6, 3)]
+    updates = deltaWriter.coalesce(changed, target)
+    assert [update["range"] for update in updates] == ["A2:B3", "A5:B5", "C6:C6"]
+    assert updates[0]["values"] == [["2.1", "2.2"], ["3.1", "3.2"]]
+
+
+# 🔹 plan_delta fallbacks
+def test_missing_or_mismatched_stamp_forces_full_write():
+    blocks = [({2: [1, 2]}, "B")]
+    deltaWriter._record(TAB, deltaWriter._target_cells(blocks), stamp="s1")
+    assert deltaWriter.plan_delta(TAB, blocks, sheet_stamp="s1")[2] is False
+    assert deltaWriter.plan_delta(TAB, blocks, sheet_stamp=None)[2] is True
+    assert deltaWriter.plan_delta(TAB, blocks, sheet_stamp="s0")[2] is True
+
+
+def test_ticker_fingerprint_mismatch_forces_full_write():
+    blocks = [({2: [1, 2], 3: [3, 4]}, "B")]
+    deltaWriter._record(TAB, deltaWriter._target_cells(blocks), fingerprint=deltaWriter._fingerprint(["AAPL", "MSFT"]), stamp="s")
+    assert deltaWriter.plan_delta(TAB, blocks, observed=["AAPL", "MSFT", ""], sheet_stamp="s")[2] is False
+    assert deltaWriter.plan_delta(TAB, blocks, observed=["MSFT", "AAPL"], sheet_stamp="s")[2] is True
+    assert deltaWriter.plan_delta(TAB, blocks, observed=["AAPL", "MSFT", "NVDA"], sheet_stamp="s")[2] is True
+
+
+def test_moved_rows_are_rewritten():
+    blocks = [({2: [1, 2], 3: [3, 4]}, "B")]
+    deltaWriter._record(TAB, deltaWriter._target_cells(blocks), row_keys={2: "AAPL", 3: "MSFT"}, stamp="s")
+    updates, _, full = deltaWriter.plan_delta(TAB, blocks, row_keys={2: "AAPL", 3: "NVDA"}, sheet_stamp="s")
+    assert not full
+    assert [update["range"] for update in updates] == ["B3:C3"]
+
+
+# 🔹 Against the fake workbook
+def test_delta_leaves_the_same_sheet_as_a_full_rewrite():
+    rng = random.Random(7)
+    tickers = [f"T{number:03d}" for number in range(40)]
+    rows = [HEADER] + [[ticker, "", "", f"note {ticker}"] for ticker in tickers]
+    workbook, reference = fakeSheets.FakeWorkbook({TAB: rows}), fakeSheets.FakeWorkbook({TAB: rows})
+    gateway = fakeSheets.install(workbook, credentials=1)
+
+    values, sent = None, []
+    for round_number in range(8):
+        new_process()
+        if round_number in (3, 6):
+            # Someone re-sorts the tab by hand (notes move with their rows) and adds a ticker
+            tickers = tickers[:]
+            rng.shuffle(tickers)
+            tickers.append(f"N{round_number}")
+            for book in (workbook, reference):
+                current = {row[0]: row for row in book.values(TAB)[1:]}
+                book.tab(TAB).clear()
+                book.tab(TAB).write_block(0, 0, [HEADER] + [current.get(ticker, [ticker]) for ticker in tickers])
+        load_universe(gateway, [TAB])
+
+        values = random_values(rng, tickers, values)
+        blocks, row_keys = blocks_for(tickers, values)
+        sent.append(deltaWriter.write_delta(TAB, blocks, gateway=gateway, row_keys=row_keys))
+        for row_values, start_col in blocks:
+            for row, cells in row_values.items():
+                reference.tab(TAB).write_block(row - 1, 1, [cells])
+
+        assert workbook.values(TAB) == reference.values(TAB), f"round {round_number}"
+
+    assert 0 < sent[1] < sent[0]  # Later runs only send what changed
+
+
+def test_unchanged_values_send_nothing():
+    workbook = fakeSheets.FakeWorkbook({TAB: [HEADER, ["AAPL"], ["MSFT"]]})
+    gateway = fakeSheets.install(workbook, credentials=1)
+    blocks, row_keys = blocks_for(["AAPL", "MSFT"], {"AAPL": [190.5, 7], "MSFT": [410, 6.5]})
+    assert deltaWriter.write_delta(TAB, blocks, gateway=gateway, row_keys=row_keys) == 4
+    writes = workbook.stats()["write"]
+    new_process()
+    assert deltaWriter.write_delta(TAB, blocks, gateway=gateway, row_keys=row_keys) == 0
+    assert workbook.stats()["write"] == writes
+
+
+def test_restored_older_state_falls_back_to_a_full_write():
+    workbook = fakeSheets.FakeWorkbook({TAB: [HEADER, ["AAPL"], ["MSFT"]]})
+    gateway = fakeSheets.install(workbook, credentials=1)
+    first, row_keys = blocks_for(["AAPL", "MSFT"], {"AAPL": [190.5, 7], "MSFT": [410, 6.5]})
+    second, _ = blocks_for(["AAPL", "MSFT"], {"AAPL": [191, 7], "MSFT": [405, 6]})
+
+    deltaWriter.write_delta(TAB, first, gateway=gateway, row_keys=row_keys)
+    with open(deltaWriter.PUBLISHED_STATE_PATH) as f:
+        old_state = json.load(f)
+    new_process()
+    deltaWriter.write_delta(TAB, second, gateway=gateway, row_keys=row_keys)
+
+    # A later run starts from the older state file, which still matches its values
+    with open(deltaWriter.PUBLISHED_STATE_PATH, "w") as f:
+        json.dump(old_state, f)
+    new_process()
+    assert deltaWriter.write_delta(TAB, first, gateway=gateway, row_keys=row_keys) == 4
+    assert workbook.values(TAB)[1:] == [["AAPL", "190.5", "7"], ["MSFT", "410", "6.5"]]
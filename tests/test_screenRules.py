@@ -0,0 +1,113 @@
+import random
+
+import pandas as pd
+import pytest
+
+from screenRules import Screen, load_screens, run_screens
+
+SHEETS = ["Large Cap", "Mid Cap", "Technology", "SP Tracker"]
+
+
+def baseline_screens(frames):
+    """The row-by-row checks updateHybrid ran before the screens moved to screens.json."""
+    large, mid, technology, sp = (frames[sheet] for sheet in SHEETS)
+    weak_large, momentum_mid, momentum_technology, momentum_sp, super_green = [], [], [], [], []
+
+    for _, row in large.iterrows():
+        if (row["1 Month Price Change"] < -3 and row["1 Week Price Change"] < -2 and row["RSI"] < 45
+                and row["Current Price"] < row["VWMA"] and row["Sentiment Ratio"] < 0.5):
+            weak_large.append(row["Symbol"])
+        if row["Score"] >= 6.8:
+            super_green.append(row["Symbol"])
+
+    for df, eligible in ((mid, momentum_mid), (technology, momentum_technology)):
+        for _, row in df.iterrows():
+            if (row["1 Month Price Change"] > 5 and row["1 Week Price Change"] > 3 and 50 <= row["RSI"] <= 75
+                    and row["Current Price"] > row["VWMA"] and row["Volume"] > df["Volume"].mean() * 1.2
+                    and row["Sentiment Ratio"] > 0.7):
+                eligible.append(row["Symbol"])
+            if row["Score"] >= 6.8:
+                super_green.append(row["Symbol"])
+
+    for _, row in sp.iterrows():
+        if (row["1 Month Price Change"] > 3 and row["1 Week Price Change"] > 2 and 40 <= row["RSI"] <= 70
+                and row["Current Price"] > row["VWMA"] and row["Sentiment Ratio"] > 0.6):
+            momentum_sp.append(row["Symbol"])
+
+    return {"Hybrid": weak_large + momentum_mid + momentum_technology + momentum_sp, "Super Green": super_green}
+
+
+# Per sheet: values that pass its Hybrid screen, and values on or just past each threshold
+PASSING = {
+    "Large Cap": {"1 Month Price Change": [-8, -4], "1 Week Price Change": [-5, -3], "RSI": [30, 44],
+                  "Sentiment Ratio": [0.2, 0.4], "vwma_ratio": [1.05]},
+    "Mid Cap": {"1 Month Price Change": [6, 9], "1 Week Price Change": [4, 6], "RSI": [55, 70],
+                "Sentiment Ratio": [0.8, 0.9], "vwma_ratio": [0.95]},
+    "SP Tracker": {"1 Month Price Change": [4, 8], "1 Week Price Change": [3, 5], "RSI": [45, 65],
+                   "Sentiment Ratio": [0.7, 0.9], "vwma_ratio": [0.95]},
+}
+PASSING["Technology"] = PASSING["Mid Cap"]
+EDGES = {"1 Month Price Change": [-3, -2.99, 3, 3.01, 5, 5.01], "1 Week Price Change": [-2, -1.99, 2, 2.01, 3, 3.01],
+         "RSI": [39.99, 40, 45, 50, 70, 70.01, 75, 75.01], "Sentiment Ratio": [0.5, 0.6, 0.7, 0.71],
+         "vwma_ratio": [1, 0.99, 1.01]}
+
+
+def random_frame(rng, sheet, rows):
+    """Numeric sheet frame with mostly passing values and the rest on or next to the thresholds."""
+    def pick(field):
+        return rng.choice(EDGES[field] if rng.random() < 0.25 else PASSING[sheet][field])
+
+    records = []
+    for number in range(rows):
+        price = round(rng.uniform(10, 200), 2)
+        records.append({
+            "Symbol": f"{sheet[:2].upper()}{number}",
+            "1 Month Price Change": pick("1 Month Price Change"),
+            "1 Week Price Change": pick("1 Week Price Change"),
+            "RSI": pick("RSI"),
+            "Current Price": price,
+            "VWMA": price * pick("vwma_ratio"),
+            "Volume": float(rng.choice([1000, 1000, 2000, 8000, 12000])),
+            "Sentiment Ratio": pick("Sentiment Ratio"),
+            "Score": rng.choice([6.79, 6.8, 6.81, round(rng.uniform(4, 9), 2)]),
+        })
+    frame = pd.DataFrame(records)
+    if rows > 1:
+        # One row exactly on the "Volume > 1.2 × sheet mean" boundary
+        others = frame["Volume"].iloc[1:].sum()
+        frame.loc[0, "Volume"] = 1.2 * others / (rows - 1.2)
+    return frame
+
+
+def test_repo_screens_compile():
+    screens = load_screens()
+    assert [screen.name for screen in screens] == [
+        "Weak Large Cap", "Momentum Mid Cap / Technology", "Momentum S&P Tracker", "Super Green"]
+    assert [screen.output for screen in screens] == ["Hybrid", "Hybrid", "Hybrid", "Super Green"]
+    assert screens[1].aggregates == [("mean", "Volume")]
+    assert "VWMA" in screens[0].columns
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_screens_match_the_old_row_by_row_checks(seed):
+    rng = random.Random(seed)
+    frames = {sheet: random_frame(rng, sheet, rng.randint(1, 60)) for sheet in SHEETS}
+    results = run_screens(load_screens(), frames)
+    expected = baseline_screens(frames)
+    for output, symbols in expected.items():
+        assert (results[output]["Symbol"].tolist() if output in results else []) == symbols, output
+
+
+def test_between_includes_both_bounds():
+    screen = Screen({"name": "RSI band", "sheets": ["Mid Cap"], "output": "Hybrid",
+                     "all": [{"column": "RSI", "op": "between", "value": [50, 75]}]})
+    df = pd.DataFrame({"RSI": [49.99, 50, 62, 75, 75.01]})
+    assert screen.mask(df, {}).tolist() == [False, True, True, True, False]
+
+
+def test_unknown_operator_or_aggregate_is_rejected():
+    with pytest.raises(ValueError, match="unknown operator"):
+        Screen({"name": "Bad", "sheets": [], "output": "Hybrid", "all": [{"column": "RSI", "op": "=>", "value": 1}]})
+    with pytest.raises(ValueError, match="unknown aggregate"):
+        Screen({"name": "Bad", "sheets": [], "output": "Hybrid",
+                "all": [{"column": "Volume", "op": ">", "value": {"aggregate": "mode", "column": "Volume"}}]})
@@ -0,0 +1,68 @@
+from sheetSnapshot import loaded_frames, remember_column
+
+# 🔹 Cross-sheet ticker universe
+# Every tab lists its own symbols, and the same ticker often appears on several tabs. The universe
+# reads all Symbol columns in one request so each unique ticker is fetched/computed once, and the
+# results are then fanned out to every (sheet, row) that references it.
+
+
+def _symbol_column(columns):
+    """Pick the column headed "Symbol" (Top Picks keeps it in B, the other tabs in A)."""
+    for column in columns:
+        if column and column[0].strip() == "Symbol":
+            return column
+    return columns[0] if columns else []
+
+
+def _collect_locations(symbols_by_sheet):
+    """{sheet_name: [symbols from row 2 down]} -> (unique tickers, {ticker: [(sheet_name, row_number)]})."""
+    locations = {}
+    for sheet_name, symbols in symbols_by_sheet.items():
+        for row_number, ticker in enumerate(symbols, start=2):
+            ticker = str(ticker).strip()
+            if not ticker or ticker == "N/A":
+                continue
+            locations.setdefault(ticker, []).append((sheet_name, row_number))
+        print(f"✅ {sheet_name}: {len(symbols)} tickers fetched")
+
+    references = sum(len(rows) for rows in locations.values())
+    print(f"🌐 Universe: {len(locations)} unique tickers across {references} sheet rows")
+    return list(locations), locations
+
+
+def read_symbols(spreadsheet, sheet_names):
+    """{sheet_name: Symbol column (header first)} for the given tabs, in one A:B read."""
+    ranges = [f"'{name}'!A:B" for name in sheet_names]
+    response = spreadsheet.values_batch_get(ranges, params={"majorDimension": "COLUMNS"})
+    return {
+        sheet_name: _symbol_column(value_range.get("values", []))
+        for sheet_name, value_range in zip(sheet_names, response.get("valueRanges", []))
+    }
+
+
+def build_universe(spreadsheet, sheet_names):
+    """Return (unique tickers, {ticker: [(sheet_name, row_number), ...]}) for the given tabs."""
+    return _collect_locations({sheet_name: column[1:]  # Skip header
+                               for sheet_name, column in read_symbols(spreadsheet, sheet_names).items()})
+
+
+def load_universe(gateway, sheet_names):
+    """Universe from the in-process snapshot when every tab is loaded, otherwise one A:B read."""
+    frames = loaded_frames(sheet_names)
+    if frames is not None and all("Symbol" in frame.columns for frame in frames.values()):
+        return _collect_locations({sheet_name: frame["Symbol"].tolist() for sheet_name, frame in frames.items()})
+    columns = gateway.read(None, lambda spreadsheet: read_symbols(spreadsheet, sheet_names))
+    for sheet_name, column in columns.items():
+        if column and column[0].strip() == "Symbol":
+            remember_column(sheet_name, "Symbol", column[1:])  # ✅ The delta writer checks it before writing
+    return _collect_locations({sheet_name: column[1:] for sheet_name, column in columns.items()})
+
+
+def fan_out(locations, values_by_ticker):
+    """Spread per-ticker results to {sheet_name: {row_number: values}}."""
+    rows_by_sheet = {}
+    for ticker, values in values_by_ticker.items():
+        for sheet_name, row_number in locations.get(ticker, []):
+            rows_by_sheet.setdefault(sheet_name, {})[row_number] = values
+    return rows_by_sheet
+
@@ -1,55 +1,30 @@
-import os  # Required for environment variables
-import json  # Required for JSON parsing
-import yfinance as yf
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import time
-import pandas as pd
-import numpy as np
 from datetime import datetime  
 import re  # ✅ Ensure `re` is imported for regex parsing
-from gspread_formatting import format_cell_range, CellFormat, Color
-
-# 🔹 Google Sheets API Setup
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-# 🔹 Load credentials for API key rotation from environment variables
-CREDS_JSON_1 = json.loads(os.getenv("GOOGLE_CREDENTIALS_1"))
-CREDS_JSON_2 = json.loads(os.getenv("GOOGLE_CREDENTIALS_2"))
-
-# ✅ Function to authenticate with Google Sheets
-def authenticate_with_json(creds_json):
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, SCOPE)
-    return gspread.authorize(creds)
-
-# ✅ Start with API Key 1
-client = authenticate_with_json(CREDS_JSON_1)
-active_api = 1  # Track which API key is being used
-
-# ✅ Function to switch API keys
-def switch_api_key():
-    global active_api, client
-    active_api = 2 if active_api == 1 else 1  # Toggle API key
-    client = authenticate_with_json(CREDS_JSON_2 if active_api == 2 else CREDS_JSON_1)
-    print(f"🔄 Switched to Google Sheets API Key {active_api}")
-
-# ✅ Open the spreadsheet and access the "Top Picks" sheet
-
-sheet = client.open("Stock Investment Analysis")
-sheets_to_update = {
-    "Large Cap": sheet.worksheet("Large Cap"),
-    "Mid Cap": sheet.worksheet("Mid Cap"),
-    "Technology": sheet.worksheet("Technology"),
-    "SP Tracker": sheet.worksheet("SP Tracker"),
-    "Top Picks": sheet.worksheet("Top Picks"),
-}
+from universe import load_universe, fan_out
+from fundamentalsCache import get_fundamentals
+from fetchPool import fetch_concurrently, yf_limiter
+from sheetsGateway import get_gateway
+from sheetSnapshot import patch_block
+from deltaWriter import write_delta
+
+# 🔹 Google Sheets access goes through the shared quota-aware gateway (GOOGLE_CREDENTIALS_1 .. N)
+gateway = get_gateway()
+
+# Sheets whose earnings columns are refreshed by this script
+SHEET_NAMES = ["Large Cap", "Mid Cap", "Technology", "SP Tracker", "Top Picks"]
+
+# 🔹 `stock.info` fields used for the earnings columns
+EARNINGS_FIELDS = [
+    "earningsTimestamp", "earningsTimestampStart", "trailingEps", "epsCurrentYear", "epsForward",
+    "revenueGrowth", "debtToEquity", "totalDebt", "earningsQuarterlyGrowth",
+]
 
 def get_earnings_data(ticker, max_retries=3):
     retries = 0
     while retries < max_retries:
         try:
-            stock = yf.Ticker(ticker)
-            stock_info = stock.info
+            stock_info = get_fundamentals(ticker, EARNINGS_FIELDS)  # ✅ Shared cache, refreshed daily
            # print('Checking Stock')
             #print(json.dumps(stock_info, indent=4))
 
@@ -88,7 +63,7 @@ def get_earnings_data(ticker, max_retries=3):
         except Exception as e:
             if "Too Many Requests" in str(e):
                 print(f"⚠️ YFinance Rate Limit hit for {ticker}. Pausing...")
-                time.sleep(60)
+                yf_limiter.backoff(60)  # ✅ Pause every worker before retrying
                 retries += 1
             else:
                 print(f"❌ Error fetching earnings data for {ticker}: {e}")
@@ -97,62 +72,33 @@ def get_earnings_data(ticker, max_retries=3):
     print(f"❌ Skipping {ticker} after retries.")
     return "N/A", "N/A", "N/A", "N/A", "N/A",999
 
-for sheet_name, ws in sheets_to_update.items():
-    print(f"\n🔁 Processing Sheet: {sheet_name}")
-    data = ws.get_all_values()
-    if len(data) < 2:
-        print(f"⚠️ Sheet {sheet_name} has no rows.")
-        continue
-
-    headers = data[0]
-
-## ✅ Redefine new headers with earnings columns
-    #new_headers = ["Rank", "Symbol", "Earnings Date", "EPS", "Revenue Growth", "Debt-to-Equity", "Earnings Surprise"] + headers[2:]
-   # updated_data = [new_headers] + [[row[0], row[1], "", "", "", "", ""] + row[2:] for row in data[1:]]
-
-    # ✅ Clear and update sheet
-   # ws.clear()
-    #ws.update("A1", updated_data)
-
-    # ✅ Re-fetch after sheet is wiped
-   # data = ws.get_all_values()
-   # headers = data[0]
-
-    for i, row in enumerate(data[1:], start=2):
-        row_dict = {headers[j]: row[j] if j < len(row) else "N/A" for j in range(len(headers))}
-        ticker = row_dict.get("Symbol", "N/A")
-
-        if not ticker or ticker == "N/A":
+# 🔹 Stage entry point (also called by pipeline.py)
+def run():
+    """Refresh the earnings columns (C:H) of every tracked sheet."""
+    # 🔹 Fetch earnings once per unique ticker, then fan out to every sheet row that lists it
+    tickers, locations = load_universe(gateway, SHEET_NAMES)
+    earnings_by_ticker = {ticker: list(values) for ticker, values in fetch_concurrently(get_earnings_data, tickers).items()}
+    earnings_rows_by_sheet = fan_out(locations, earnings_by_ticker)
+    row_keys_by_sheet = fan_out(locations, {ticker: ticker for ticker in locations})  # {sheet: {row: ticker}}
+
+    for sheet_name in SHEET_NAMES:
+        print(f"\n🔁 Processing Sheet: {sheet_name}")
+        earnings_rows = earnings_rows_by_sheet.get(sheet_name, {})
+        if not earnings_rows:
+            print(f"⚠️ Sheet {sheet_name} has no rows.")
             continue
 
-        earnings_date, eps, revenue_growth, debt_to_equity, earnings_surprise,dte_val = get_earnings_data(ticker)
+        # ✅ Earnings Date, EPS, Revenue Growth, Debt-to-Equity, Earnings Surprise, DTE (C:H), changed cells only
+        try:
+            write_delta(sheet_name, [(earnings_rows, "C")], gateway, row_keys=row_keys_by_sheet[sheet_name])
+            patch_block(sheet_name, earnings_rows, "C")  # ✅ Later stages in this process see the new values
+            print(f"✅ Updated Earnings Data for {len(earnings_rows)} rows in {sheet_name}")
+        except gspread.exceptions.APIError as e:
+            print(f"❌ Error updating Google Sheets for {sheet_name}: {e}")
 
-        updates = [
-            {"range": f"C{i}", "values": [[earnings_date]]},
-            {"range": f"D{i}", "values": [[eps]]},
-            {"range": f"E{i}", "values": [[revenue_growth]]},
-            {"range": f"F{i}", "values": [[debt_to_equity]]},
-            {"range": f"G{i}", "values": [[earnings_surprise]]},
-            {"range": f"H{i}", "values": [[dte_val]]},  
-        ]
+    print("\n✅ Earnings Data Successfully Updated in All Sheets!")
+    return earnings_by_ticker
 
-        retry_attempts = 0
-        while retry_attempts < 5:
-            try:
-                ws.batch_update(updates)
-                print(f"✅ Updated Earnings Data for {ticker} in {sheet_name} row {i}")
-                time.sleep(1)
-                break
-            except gspread.exceptions.APIError as e:
-                if "429" in str(e):
-                    retry_attempts += 1
-                    print(f"⚠️ Rate limit! Retrying (Attempt {retry_attempts})...")
-                    time.sleep(10)
-                    switch_api_key()
-                    sheet = client.open("Stock Investment Analysis")
-                    ws = sheet.worksheet(sheet_name)
-                else:
-                    print(f"❌ Error updating Google Sheets for {ticker} in {sheet_name}: {e}")
-                    break
-
-print("\n✅ Earnings Data Successfully Updated in All Sheets!")
+
+if __name__ == "__main__":
+    run()